@@ -0,0 +1,178 @@
+"""
+Build dos arquivos estáticos do frontend para cache de longo prazo.
+
+    python -m app.core.assets build [--src ../frontend] [--out ../frontend/dist]
+
+Copia o frontend para `--out` e:
+- grava cada asset (js, css, imagens, fontes) também como
+  "nome.<hash>.ext", com o hash do conteúdo;
+- reescreve as referências nas páginas HTML (src/href) e os imports entre
+  módulos JS para os nomes com hash;
+- gera versões .gz (e .br, se o pacote `brotli` estiver instalado) dos
+  arquivos de texto;
+- grava manifest.json (original -> com hash).
+
+Os nomes originais continuam existindo (referências dinâmicas, favicon.ico
+pedido pelo navegador) e são servidos com revalidação por ETag.
+Ver app/core/static.py para como são servidos.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+
+FINGERPRINT_EXTENSIONS = {
+    ".js", ".css", ".png", ".jpg", ".jpeg", ".gif", ".svg", ".ico", ".webp", ".woff", ".woff2",
+}
+COMPRESS_EXTENSIONS = {".html", ".js", ".css", ".json", ".svg", ".txt", ".ico"}
+COMPRESS_MIN_BYTES = 1024
+HASH_LENGTH = 10
+
+_HTML_REF = re.compile(r'''((?:src|href)\s*=\s*["'])([^"'#?]+)''')
+_JS_IMPORT = re.compile(r'''((?:\bfrom|\bimport)\s*\(?\s*["'])(\.{1,2}/[^"']+)''')
+
+
+def _fingerprint(name: str, content: bytes) -> str:
+    stem, ext = os.path.splitext(name)
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    return f"{stem}.{digest}{ext}"
+
+
+def _resolve(ref: str, base_dir: str, assets: dict):
+    """Caminho do asset (relativo à raiz) a que `ref` se refere, ou None"""
+    if re.match(r"^([a-z]+:|//)", ref):
+        return None
+    for candidate in (os.path.join(base_dir, ref), ref.lstrip("/")):
+        candidate = os.path.normpath(candidate).replace(os.sep, "/")
+        if candidate in assets:
+            return candidate
+    return None
+
+
+class _Builder:
+    def __init__(self, src: str, out: str):
+        self.src = os.path.abspath(src)
+        self.out = os.path.abspath(out)
+        self.files = {}      # caminho relativo -> bytes
+        self.manifest = {}   # caminho relativo -> caminho com hash
+        self.visiting = set()
+
+    def load(self):
+        for root, dirs, names in os.walk(self.src):
+            dirs[:] = [
+                d for d in dirs
+                if not d.startswith(".") and os.path.join(root, d) != self.out
+            ]
+            for name in names:
+                if name.startswith("."):
+                    continue
+                full = os.path.join(root, name)
+                rel = os.path.relpath(full, self.src).replace(os.sep, "/")
+                with open(full, "rb") as f:
+                    self.files[rel] = f.read()
+
+    def _rewrite(self, rel: str, content: bytes, pattern) -> bytes:
+        base_dir = os.path.dirname(rel)
+        text = content.decode("utf-8")
+
+        def replace(match):
+            prefix, ref = match.group(1), match.group(2)
+            target = _resolve(ref, base_dir, self.files)
+            if target is None or os.path.splitext(target)[1] not in FINGERPRINT_EXTENSIONS:
+                return match.group(0)
+            hashed = os.path.basename(self.fingerprint(target))
+            return prefix + ref[: len(ref) - len(os.path.basename(ref))] + hashed
+
+        return pattern.sub(replace, text).encode("utf-8")
+
+    def fingerprint(self, rel: str) -> str:
+        """Nome com hash de `rel`; módulos JS têm os imports reescritos antes"""
+        if rel in self.manifest:
+            return self.manifest[rel]
+        if rel in self.visiting:
+            # o hash de um depende do hash do outro: não há ordem possível
+            raise ValueError(f"Import circular entre módulos: {rel}")
+
+        content = self.files[rel]
+        if rel.endswith(".js"):
+            self.visiting.add(rel)
+            content = self._rewrite(rel, content, _JS_IMPORT)
+            self.visiting.discard(rel)
+            self.files[rel] = content
+
+        hashed = "/".join(filter(None, [os.path.dirname(rel), _fingerprint(os.path.basename(rel), content)]))
+        self.manifest[rel] = hashed
+        return hashed
+
+    def build(self) -> dict:
+        self.load()
+
+        for rel in sorted(self.files):
+            if os.path.splitext(rel)[1] in FINGERPRINT_EXTENSIONS:
+                self.fingerprint(rel)
+
+        for rel in list(self.files):
+            if rel.endswith(".html"):
+                self.files[rel] = self._rewrite(rel, self.files[rel], _HTML_REF)
+
+        output = dict(self.files)
+        for rel, hashed in self.manifest.items():
+            output[hashed] = self.files[rel]
+
+        if os.path.isdir(self.out):
+            shutil.rmtree(self.out)
+        for rel, content in output.items():
+            path = os.path.join(self.out, rel)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(content)
+            _precompress(path, content)
+
+        with open(os.path.join(self.out, "manifest.json"), "w") as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+
+        return self.manifest
+
+
+def _precompress(path: str, content: bytes):
+    if os.path.splitext(path)[1] not in COMPRESS_EXTENSIONS or len(content) < COMPRESS_MIN_BYTES:
+        return
+
+    gz = gzip.compress(content, compresslevel=9, mtime=0)
+    if len(gz) < len(content):
+        with open(path + ".gz", "wb") as f:
+            f.write(gz)
+
+    try:
+        import brotli  # opcional
+    except ImportError:
+        return
+    br = brotli.compress(content, quality=11)
+    if len(br) < len(content):
+        with open(path + ".br", "wb") as f:
+            f.write(br)
+
+
+def build(src: str, out: str) -> dict:
+    return _Builder(src, out).build()
+
+
+def main(argv=None):
+    here = os.path.dirname(os.path.abspath(__file__))
+    frontend = os.path.normpath(os.path.join(here, "..", "..", "..", "frontend"))
+
+    parser = argparse.ArgumentParser(description="Build dos estáticos do frontend")
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("--src", default=frontend)
+    parser.add_argument("--out", default=os.path.join(frontend, "dist"))
+    args = parser.parse_args(argv)
+
+    manifest = build(args.src, args.out)
+    print(f"{len(manifest)} assets com hash em {args.out}")
+
+
+if __name__ == "__main__":
+    main()
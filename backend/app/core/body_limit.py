@@ -0,0 +1,48 @@
+"""
+Limite de tamanho do corpo da requisição, aplicado antes do FastAPI ler o
+formulário.
+
+O parser de multipart do Starlette grava o upload inteiro (em memória ou
+num arquivo temporário) antes de a rota rodar; checar o tamanho só dentro
+da rota não impede que um upload enorme seja recebido por completo.
+Aqui a requisição é recusada com 413 pelo Content-Length, sem ler o corpo,
+ou assim que o corpo recebido (chunked / Content-Length falso) passa do
+limite.
+"""
+from fastapi import HTTPException
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+
+class BodySizeLimitMiddleware:
+    def __init__(self, app, limits: dict):
+        self.app = app
+        self.limits = limits  # caminho -> bytes
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope.get("path")) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"Requisição maior que {limit // (1024 * 1024)} MB"
+
+        length = Headers(scope=scope).get("content-length", "")
+        if length.isdigit() and int(length) > limit:
+            response = JSONResponse({"detail": detail}, status_code=413, headers={"Connection": "close"})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # HTTPException atravessa o parser do FastAPI e vira o 413
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
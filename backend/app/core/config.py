@@ -28,8 +28,61 @@ AI_MODEL = os.getenv("AI_MODEL", "gpt-4o-mini")
 MAX_INPUT_LENGTH = int(os.getenv("MAX_INPUT_LENGTH", 500))
 MAX_MESSAGE_HISTORY = int(os.getenv("MAX_MESSAGE_HISTORY", 10))
 
+# Orçamento de tokens do histórico enviado à IA (por modelo)
+# Ex.: MODEL_TOKEN_BUDGETS="gpt-4o-mini=6000,gpt-5.2=12000"
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", 4000))
+MODEL_TOKEN_BUDGETS = {
+    model.strip(): int(budget)
+    for model, budget in (
+        item.split("=", 1) for item in os.getenv("MODEL_TOKEN_BUDGETS", "").split(",") if "=" in item
+    )
+}
+
+# Cota diária de tokens (prompt + resposta) por tipo de conta; tipos fora
+# da lista não têm limite. Ex.: TOKEN_QUOTAS="student=200000,livre=50000"
+TOKEN_QUOTAS = {
+    account_type.strip(): int(quota)
+    for account_type, quota in (
+        item.split("=", 1) for item in os.getenv("TOKEN_QUOTAS", "").split(",") if "=" in item
+    )
+}
+
+# Resumo acumulado das conversas longas (em segundo plano, fora do request):
+# quando as mensagens passam de MAX_MESSAGE_HISTORY, as mais antigas (todas
+# menos as SUMMARY_KEEP_RECENT últimas) viram um resumo salvo na conversa, e
+# a IA recebe resumo + final da conversa.
+#   llm   -> resumo escrito pelo modelo (AI_SUMMARY_MODEL; vazio = AI_MODEL)
+#   local -> resumo extrativo determinístico, sem IA (testes/desenvolvimento)
+#   off   -> desligado
+SUMMARIZER = os.getenv("SUMMARIZER", "llm")
+AI_SUMMARY_MODEL = os.getenv("AI_SUMMARY_MODEL", "")
+SUMMARY_KEEP_RECENT = int(os.getenv("SUMMARY_KEEP_RECENT", 4))
+SUMMARY_MAX_TOKENS = int(os.getenv("SUMMARY_MAX_TOKENS", 400))
+
+# Cache em memória do final do histórico de cada conversa
+HISTORY_CACHE_SIZE = int(os.getenv("HISTORY_CACHE_SIZE", 1000))
+HISTORY_CACHE_TTL = int(os.getenv("HISTORY_CACHE_TTL", 300))
+
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# Controle de admissão das chamadas à IA (por worker)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 16))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", 64))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", 10))
+
+# Resiliência das chamadas à IA
+AI_FALLBACK_MODEL = os.getenv("AI_FALLBACK_MODEL", "")  # vazio = sem modelo reserva
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 30))  # prazo por tentativa (até o 1º byte no stream)
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", 5))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", 0.5))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", 4))
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", 5))  # falhas seguidas
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", 30))
+
+# Na subida, além de criar o cliente, abre a conexão com a API da OpenAI
+AI_WARMUP_CONNECT = os.getenv("AI_WARMUP_CONNECT", "true").lower() in ("1", "true", "yes")
+
 # =========================================================
 # SECURITY CONFIG
 # =========================================================
@@ -38,14 +91,109 @@ SECRET_KEY = os.getenv("SECRET_KEY", "CHANGE_ME_IN_PRODUCTION")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
 
+# bcrypt: custo (log2 das rodadas) e pool de processos para o hash
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", min(2, os.cpu_count() or 1)))  # 0 = sem pool
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", 32))
+HASH_QUEUE_TIMEOUT = float(os.getenv("HASH_QUEUE_TIMEOUT", 5))
+
+# Cache de respostas do modo visitante (perguntas repetidas da landing page)
+GUEST_CACHE_ENABLED = os.getenv("GUEST_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+GUEST_CACHE_SIZE = int(os.getenv("GUEST_CACHE_SIZE", 2000))
+GUEST_CACHE_MAX_BYTES = int(os.getenv("GUEST_CACHE_MAX_BYTES", 8 * 1024 * 1024))
+GUEST_CACHE_TTL = int(os.getenv("GUEST_CACHE_TTL", 3600))
+
+# Cache de usuários autenticados (por "sub" do token) e de tokens já validados
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", 60))
+
+# =========================================================
+# RATE LIMIT CONFIG
+# =========================================================
+
+# "memory" (por worker) ou "sql" (compartilhado entre workers via banco)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000))
+
+# Formato "requisições/segundos"
+CHAT_GUEST_LIMIT = os.getenv("CHAT_GUEST_LIMIT", "10/3600")
+CHAT_USER_LIMIT = os.getenv("CHAT_USER_LIMIT", "30/60")
+LOGIN_LIMIT = os.getenv("LOGIN_LIMIT", "10/60")
+
 # =========================================================
 # DATABASE CONFIG
 # =========================================================
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./database.db")
 
+# Pool de conexões (por processo e por engine; ignorado no SQLite)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))  # espera máxima por uma conexão livre
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))  # segundos; -1 = nunca recicla
+
+# Réplica de leitura (vazio = tudo no primário) e por quantos segundos quem
+# gravou um turno do chat continua lendo do primário
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL", "")
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", 10))
+
+# Gravação dos turnos do chat:
+#   direct  -> cada turno em uma transação própria, no request
+#   batched -> turnos de conversas existentes são agrupados (write-behind) e
+#              gravados em lote a cada PERSIST_BATCH_INTERVAL_MS
+# PERSIST_DURABILITY (só no batched):
+#   commit  -> o request espera o commit do lote (nada se perde)
+#   enqueue -> responde ao enfileirar; uma queda do processo perde o lote
+#              em andamento (até PERSIST_BATCH_INTERVAL_MS de mensagens)
+PERSIST_MODE = os.getenv("PERSIST_MODE", "direct")
+PERSIST_DURABILITY = os.getenv("PERSIST_DURABILITY", "commit")
+PERSIST_BATCH_INTERVAL_MS = float(os.getenv("PERSIST_BATCH_INTERVAL_MS", 5))
+PERSIST_BATCH_MAX = int(os.getenv("PERSIST_BATCH_MAX", 200))
+
+# Aplica as migrações pendentes ao subir a API. Desligado por padrão: em
+# produção rode `python -m app.database.migrate upgrade` no deploy e a
+# subida não toca no schema (o .env.example liga para desenvolvimento)
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "false").lower() in ("1", "true", "yes")
+
+# Conexões abertas em cada pool (sync e async) antes de aceitar tráfego
+DB_WARMUP_CONNECTIONS = int(os.getenv("DB_WARMUP_CONNECTIONS", 2))
+
+# =========================================================
+# UPLOADS (FOTO DE PERFIL)
+# =========================================================
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+PROFILE_IMAGE_MAX_BYTES = int(os.getenv("PROFILE_IMAGE_MAX_BYTES", 5 * 1024 * 1024))
+# Lados (px) das miniaturas WebP geradas em segundo plano
+THUMBNAIL_SIZES = [int(s) for s in os.getenv("THUMBNAIL_SIZES", "64,128,256").split(",") if s.strip()]
+
+# =========================================================
+# FRONTEND
+# =========================================================
+
+# Pasta gerada por `python -m app.core.assets build` (ex.: ../frontend/dist).
+# Vazio = a API não serve o frontend (http.server, nginx, CDN...)
+FRONTEND_DIR = os.getenv("FRONTEND_DIR", "")
+
+# =========================================================
+# RESPOSTAS JSON (HISTÓRICO)
+# =========================================================
+
+# Compressão negociada (br/gzip) das respostas grandes de /conversations
+RESPONSE_COMPRESS_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", 1024))
+RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", 6))
+# Brotli só é usado se o pacote `brotli` estiver instalado
+RESPONSE_BROTLI_QUALITY = int(os.getenv("RESPONSE_BROTLI_QUALITY", 4))
+
 # =========================================================
 # CORS CONFIG
 # =========================================================
 
 CORS_ORIGINS = os.getenv("CORS_ORIGINS", "*").split(",")
+
+# =========================================================
+# OBSERVABILIDADE
+# =========================================================
+
+# Endpoint /metrics (Prometheus) + header Server-Timing por request
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
@@ -1,10 +1,15 @@
+from time import time
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from sqlalchemy.orm import Session
 
-from app.database.database import SessionLocal
+from app.database.database import SessionLocal, read_session_for
 from app.models.user import User
+from app.core.cache import TTLCache
+from app.core.metrics import timed
+from app.core.config import USER_CACHE_SIZE, USER_CACHE_TTL
 from app.core.security import SECRET_KEY, ALGORITHM
 
 # OAuth2
@@ -26,6 +31,60 @@ def get_db():
         db.close()
 
 
+def get_read_db(token: str | None = Depends(oauth2_scheme)):
+    """
+    Sessão para rotas só de leitura: réplica (se configurada), salvo para
+    quem gravou um turno há pouco (read-your-writes). Nunca faça commit nela.
+    """
+    try:
+        subject = _decode_token(token) if token else None
+    except JWTError:
+        subject = None  # get_current_user_read responde o 401
+
+    db = read_session_for(subject)()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# =========================
+# CACHES DE AUTENTICAÇÃO
+# =========================
+# token -> sub, válido até o "exp" do próprio token (a assinatura não muda)
+token_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+# sub (id ou email) -> colunas do usuário (nunca o objeto ORM, que é ligado
+# a uma sessão e expira no commit)
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+
+def _user_snapshot(user: User) -> dict:
+    return {c.name: getattr(user, c.name) for c in User.__table__.columns}
+
+
+def invalidate_user_cache(*subjects):
+    """Descarta usuários do cache (passe id e email: o "sub" pode ser qualquer um)"""
+    user_cache.invalidate(*(str(s) for s in subjects if s is not None))
+
+
+def _decode_token(token: str) -> str | None:
+    """Valida o JWT uma vez e memoriza o "sub" até o token expirar"""
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    subject = payload.get("sub")
+
+    if subject is not None:
+        exp = payload.get("exp")
+        ttl = exp - time() if exp else USER_CACHE_TTL
+        if ttl > 0:
+            token_cache.set(token, subject, ttl=ttl)
+
+    return subject
+
+
 # =========================
 # AUTH DEPENDENCY
 # =========================
@@ -36,6 +95,19 @@ def get_current_user(
     if not token:
         return None
 
+    with timed("auth"):
+        return _resolve_user(token, db)
+
+
+def get_current_user_read(
+    token: str | None = Depends(oauth2_scheme),
+    db: Session = Depends(get_read_db)
+):
+    """get_current_user pela sessão de leitura (mesma sessão da rota)"""
+    return get_current_user(token, db)
+
+
+def _resolve_user(token: str, db: Session) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Token inválido ou expirado",
@@ -43,13 +115,17 @@ def get_current_user(
     )
 
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id_from_token = payload.get("sub")
+        user_id_from_token = _decode_token(token)
         if user_id_from_token is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
 
+    # Cache: evita a ida ao banco em toda requisição autenticada
+    cached = user_cache.get(user_id_from_token)
+    if cached is not None:
+        return User(**cached)
+
 
 
     # ==========================================================
@@ -71,4 +147,5 @@ def get_current_user(
     if not user:
         raise credentials_exception
 
+    user_cache.set(user_id_from_token, _user_snapshot(user))
     return user
@@ -0,0 +1,268 @@
+"""
+Métricas em memória (por worker) no formato texto do Prometheus.
+
+- Counter / Gauge / Histogram com labels, sem dependências externas.
+  Histogramas têm buckets fixos: `observe()` é um bisect + dois
+  incrementos, barato o bastante para ficar sempre ligado.
+- `timed(stage)` mede um trecho do request atual e alimenta
+  `atena_stage_seconds{route,stage}`; o MetricsMiddleware abre o coletor
+  por request, registra a latência total e devolve o header Server-Timing.
+- Valores lidos na hora da coleta (pool do banco, fila da IA...) entram
+  via `register_collector()`.
+"""
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Callable, Iterable, Optional
+
+
+# Buckets em segundos (de 5 ms a 60 s: cobre banco, auth e chamadas à IA)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# ============================
+# TIPOS DE MÉTRICA
+# ============================
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._series: dict = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(n, "") for n in self.labelnames)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            series = list(self._series.items())
+        for key, value in series:
+            lines.extend(self._render_series(key, value))
+        return lines
+
+    def _render_series(self, key: tuple, value) -> list:
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._series[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [contagem por bucket (+Inf no fim), soma]
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def _render_series(self, key: tuple, value) -> list:
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = 'le="' + _number(bound) + '"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total}")
+        lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+# ============================
+# REGISTRO
+# ============================
+_metrics: list = []
+_collectors: list = []
+
+
+def counter(name: str, help: str, labels: Iterable[str] = ()) -> Counter:
+    metric = Counter(name, help, labels)
+    _metrics.append(metric)
+    return metric
+
+
+def gauge(name: str, help: str, labels: Iterable[str] = ()) -> Gauge:
+    metric = Gauge(name, help, labels)
+    _metrics.append(metric)
+    return metric
+
+
+def histogram(name: str, help: str, labels: Iterable[str] = (), buckets=LATENCY_BUCKETS) -> Histogram:
+    metric = Histogram(name, help, labels, buckets)
+    _metrics.append(metric)
+    return metric
+
+
+def register_collector(func: Callable[[], None]):
+    """`func` é chamada a cada coleta para atualizar gauges derivados"""
+    _collectors.append(func)
+    return func
+
+
+def render_metrics() -> str:
+    for collect in _collectors:
+        collect()
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ============================
+# MÉTRICAS DA APLICAÇÃO
+# ============================
+REQUEST_SECONDS = histogram(
+    "atena_request_seconds", "Latência total por rota", ("method", "route", "status")
+)
+STAGE_SECONDS = histogram(
+    "atena_stage_seconds", "Latência por etapa do request", ("route", "stage")
+)
+LLM_TOKENS = counter(
+    "atena_llm_tokens_total", "Tokens consumidos no provedor (response.usage)", ("model", "kind")
+)
+RATE_LIMITED = counter(
+    "atena_rate_limited_total", "Requisições recusadas pelo rate limit", ("limit", "client")
+)
+
+
+# ============================
+# COLETOR POR REQUEST
+# ============================
+class RequestTimings:
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.stages: dict = {}
+
+    @property
+    def route(self) -> str:
+        return _route_of(self.scope)
+
+    def add(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages.items())
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def observe_stage(stage: str, seconds: float):
+    """Registra uma etapa no request atual (fora de request: rota vazia)"""
+    timings = _current.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+    STAGE_SECONDS.observe(seconds, route=timings.route if timings else "", stage=stage)
+
+
+@contextmanager
+def timed(stage: str):
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, perf_counter() - start)
+
+
+def record_usage(model: str, usage):
+    """Soma prompt/completion tokens de `response.usage` (quando vier)"""
+    if usage is None:
+        return
+    LLM_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, model=model, kind="prompt")
+    LLM_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, model=model, kind="completion")
+
+
+class MetricsMiddleware:
+    """
+    ASGI puro (sem BaseHTTPMiddleware): abre o coletor do request, mede a
+    latência total por rota e anexa Server-Timing com as etapas já medidas
+    quando a resposta começa.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings(scope)
+        token = _current.set(timings)
+        start = perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if timings.stages:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", timings.server_timing().encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            REQUEST_SECONDS.observe(
+                perf_counter() - start,
+                method=scope["method"],
+                route=timings.route,
+                status=status
+            )
+
+
+def _route_of(scope) -> str:
+    # Template da rota ("/conversations/{conversation_id}"), não o path real:
+    # mantém a cardinalidade dos labels limitada
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
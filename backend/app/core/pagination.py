@@ -0,0 +1,75 @@
+"""
+Cursores opacos para paginação por chave (keyset).
+"""
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import and_, func, literal, or_, select
+from sqlalchemy.orm import aliased
+
+
+def encode_cursor(*values) -> str:
+    """Serializa a chave da última linha da página (datetimes em ISO)"""
+    raw = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(raw).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *types) -> list:
+    """Inverso de encode_cursor; `types` converte cada posição (datetime, int...)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if len(raw) != len(types):
+            raise ValueError("tamanho inválido")
+        return [
+            datetime.fromisoformat(v) if t is datetime else t(v)
+            for v, t in zip(raw, types)
+        ]
+    except (ValueError, TypeError, json.JSONDecodeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def keyset_filter(model, column, cursor_id: int, direction: str = "before"):
+    """
+    Linhas antes/depois da linha `cursor_id` na ordem (column, id).
+
+    O valor de `column` da linha do cursor vem de uma subconsulta, não de um
+    parâmetro: no SQLite, datetimes gravados por CURRENT_TIMESTAMP
+    ("YYYY-MM-DD HH:MM:SS") e os enviados pelo Python ("...SS.000000") são
+    comparados como texto e erram no desempate dentro do mesmo segundo.
+    Comparando valor gravado com valor gravado, o formato é sempre o mesmo.
+    Só para colunas que não mudam (created_at); para updated_at, veja
+    keyset_before_value.
+    """
+    ref = aliased(model)  # sem alias, a subconsulta se correlacionaria com a externa
+    pivot = select(getattr(ref, column.key)).where(ref.id == cursor_id).scalar_subquery()
+
+    if direction == "before":
+        return or_(column < pivot, and_(column == pivot, model.id < cursor_id))
+    return or_(column > pivot, and_(column == pivot, model.id > cursor_id))
+
+
+def sortable_datetime(column, dialect: str):
+    """
+    Expressão de ordenação para uma coluna de data/hora. No SQLite, datetimes
+    são texto em dois formatos (CURRENT_TIMESTAMP e o do Python, com
+    microssegundos) que não se comparam direito; strftime com %f leva os dois
+    ao mesmo formato. Nos outros bancos, a própria coluna.
+    """
+    if dialect == "sqlite":
+        return func.strftime("%Y-%m-%d %H:%M:%f", column)
+    return column
+
+
+def keyset_before_value(column, id_column, value: datetime, row_id: int, dialect: str):
+    """
+    Linhas antes de (value, row_id) na ordem decrescente (column, id), com
+    os valores vindos do próprio cursor. Para colunas que mudam (updated_at):
+    a linha do cursor pode ter sido alterada ou apagada entre as páginas.
+    Ordene a consulta por sortable_datetime(column, dialect).
+    """
+    key = sortable_datetime(column, dialect)
+    pivot = sortable_datetime(literal(value, column.type), dialect)
+    return or_(key < pivot, and_(key == pivot, id_column < row_id))
@@ -1,4 +1,6 @@
+import json
 from datetime import date
+from functools import lru_cache
 from typing import Dict, Any, Optional
 
 # ============================
@@ -52,7 +54,7 @@ IMPORTANT — CONTEXT:
 - Short questions like "what if it were blue?" refer to the previous topic.
 """
 
-def calculate_age(birth_date):
+def calculate_age(birth_date, today: Optional[date] = None):
     """Calcula a idade exata com base na data de nascimento (string ou date)."""
     if not birth_date:
         return None
@@ -65,27 +67,41 @@ def calculate_age(birth_date):
         else:
             birth = birth_date
             
-        today = date.today()
+        today = today or date.today()
         return today.year - birth.year - ((today.month, today.day) < (birth.month, birth.day))
     except:
         return None
 
-def _build_user_context(user_data: Dict[str, Any], language: str) -> str:
+def _parse_interests(interests_raw) -> list:
+    """Interesses chegam como lista, JSON ('["math"]') ou texto separado por vírgula."""
+    if not interests_raw:
+        return []
+    if isinstance(interests_raw, str):
+        try:
+            parsed = json.loads(interests_raw)
+            if isinstance(parsed, list):
+                return parsed
+        except json.JSONDecodeError:
+            pass
+        return [i.strip() for i in interests_raw.split(",") if i.strip()]
+    return list(interests_raw)
+
+def _build_user_context(
+    is_english: bool,
+    name: str,
+    nickname: str,
+    birth_date,
+    gender_raw: str,
+    interests: tuple,
+    role: str,
+    today: date
+) -> str:
     """Constrói o bloco de texto com os dados do usuário para o prompt."""
-    if not user_data:
-        return ""
-
-    is_english = language and language.lower().startswith("en")
+    display_name = nickname if nickname else (name.split()[0] if name.strip() else "")
     
-    # Extração de Dados
-    name = user_data.get("name") or user_data.get("full_name") or ""
-    nickname = user_data.get("nickname") or ""
-    display_name = nickname if nickname else name.split()[0]
-    
-    age_val = calculate_age(user_data.get("birth_date"))
+    age_val = calculate_age(birth_date, today)
     age_str = str(age_val) if age_val is not None else ("Unknown" if is_english else "Não informada")
     
-    gender_raw = user_data.get("gender", "other")
     gender_map = {
         "male": ("Masculino", "Male"),
         "female": ("Feminino", "Female"),
@@ -93,50 +109,75 @@ def _build_user_context(user_data: Dict[str, Any], language: str) -> str:
     }
     gender = gender_map.get(gender_raw, gender_map["other"])[1 if is_english else 0]
 
-    # Interesses (lista ou string)
-    interests_raw = user_data.get("interests", [])
-    if isinstance(interests_raw, str):
-        interests_raw = [i.strip() for i in interests_raw.split(",") if i.strip()]
-    
-    interests_str = ", ".join([str(i).capitalize() for i in interests_raw]) if interests_raw else ("None" if is_english else "Nenhum informado")
+    interests_str = ", ".join([str(i).capitalize() for i in interests]) if interests else ("None" if is_english else "Nenhum informado")
 
-    role = user_data.get("account_type", "student")
     role_str = "TEACHER" if role == "teacher" else "STUDENT"
 
     # Construção do Bloco de Contexto
     if is_english:
         context = f"""
-\n--- STUDENT PROFILE (USER DATA) ---
+--- STUDENT PROFILE (USER DATA) ---
 - Name: {name}
 - Call as: {display_name}
 - Age: {age_str} years old
 - Gender: {gender}
 - Role: {role_str}
 - Interests/Hobbies: {interests_str}
---- END PROFILE ---\n
+--- END PROFILE ---
 """
     else:
         context = f"""
-\n--- PERFIL DO ALUNO (DADOS DO USUÁRIO) ---
+--- PERFIL DO ALUNO (DADOS DO USUÁRIO) ---
 - Nome Completo: {name}
 - Como chamar: {display_name}
 - Idade: {age_str} anos
 - Gênero: {gender}
 - Função: {role_str}
 - Interesses/Hobbies: {interests_str}
---- FIM DO PERFIL ---\n
+--- FIM DO PERFIL ---
 """
     return context
 
+# ============================
+# PROMPT FINAL (MEMOIZADO)
+# ============================
+# O prompt começa sempre pelo texto base do idioma, byte a byte igual para
+# todos os usuários, e só depois vem o perfil. Assim o prefixo é reaproveitado
+# pelo cache de prefixo do provedor. Os próprios campos do perfil (mais a data,
+# por causa da idade) formam a chave: qualquer edição do perfil gera outra
+# entrada, sem precisar invalidar nada.
+
+def user_profile(user) -> Dict[str, Any]:
+    """Extrai do model User os campos usados no prompt."""
+    return {
+        "name": user.full_name,
+        "nickname": user.nickname,
+        "birth_date": user.birth_date,
+        "gender": user.gender,
+        "interests": user.interests,
+        "account_type": user.account_type
+    }
+
+@lru_cache(maxsize=4096)
+def _compile_prompt(is_english: bool, profile: Optional[tuple], today: date) -> str:
+    base = SYSTEM_PROMPT_EN if is_english else SYSTEM_PROMPT_PT
+    if profile is None:
+        return base
+    return base + _build_user_context(is_english, *profile, today)
+
 def get_system_prompt(language: str | None, user_data: Dict[str, Any] = None) -> str:
     """Gera o prompt final combinando instruções base e dados do usuário."""
-    lang = language.lower() if language else "pt"
-    
-    if lang.startswith("en"):
-        base = SYSTEM_PROMPT_EN
-    else:
-        base = SYSTEM_PROMPT_PT
-    
-    context = _build_user_context(user_data or {}, lang)
-    
-    return base + context
\ No newline at end of file
+    is_english = bool(language) and language.lower().startswith("en")
+
+    profile = None
+    if user_data:
+        profile = (
+            user_data.get("name") or user_data.get("full_name") or "",
+            user_data.get("nickname") or "",
+            user_data.get("birth_date"),
+            user_data.get("gender") or "other",
+            tuple(str(i) for i in _parse_interests(user_data.get("interests"))),
+            user_data.get("account_type") or "student",
+        )
+
+    return _compile_prompt(is_english, profile, date.today())
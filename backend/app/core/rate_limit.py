@@ -0,0 +1,174 @@
+"""
+Rate limiting por rota (token bucket) para visitantes e usuários logados.
+
+Cada chave ("<rota>:ip:<ip>" ou "<rota>:user:<id>") tem um balde com
+`capacity` tokens que se recarrega a `capacity / per_seconds` tokens por
+segundo; cada requisição consome um. Backends:
+
+- memory: dicionário LRU por worker, com expulsão de chaves ociosas;
+- sql:    tabela `rate_limits`, um UPSERT atômico por requisição — o limite
+          vale para todos os workers/instâncias.
+"""
+import math
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from time import time, monotonic
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Request
+from sqlalchemy import case, delete, literal
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.core.config import RATE_LIMIT_BACKEND, RATE_LIMIT_MAX_KEYS
+from app.core.dependencies import get_current_user
+from app.core.metrics import RATE_LIMITED
+from app.database.database import AsyncSessionLocal
+from app.models.rate_limit import RateLimitBucket
+
+
+IDLE_KEY_SECONDS = 86400
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    capacity: int
+    per_seconds: float
+
+    @classmethod
+    def parse(cls, value: str) -> "RateLimit":
+        """"10/3600" -> 10 requisições por hora"""
+        count, seconds = value.split("/", 1)
+        return cls(int(count), float(seconds))
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.per_seconds
+
+
+# ============================
+# BACKEND EM MEMÓRIA
+# ============================
+class MemoryBackend:
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict = OrderedDict()  # key -> (tokens, updated_at, idle_after)
+        self._lock = threading.Lock()
+        self._next_sweep = 0.0
+
+    async def hit(self, key: str, limit: RateLimit) -> tuple:
+        now = time()
+        with self._lock:
+            tokens, updated_at, _ = self._buckets.pop(key, (limit.capacity, now, 0))
+            tokens = min(limit.capacity, tokens + (now - updated_at) * limit.rate)
+
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+
+            # Depois de `idle_after` o balde estaria cheio: pode ser descartado
+            idle_after = now + (limit.capacity - tokens) / limit.rate
+            self._buckets[key] = (tokens, now, idle_after)
+
+            self._evict(now)
+
+        return allowed, tokens
+
+    def _evict(self, now: float):
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+        if now >= self._next_sweep:
+            self._next_sweep = now + 60
+            for key in [k for k, (_, _, idle) in self._buckets.items() if idle <= now]:
+                del self._buckets[key]
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+# ============================
+# BACKEND SQL (COMPARTILHADO)
+# ============================
+class SQLBackend:
+    def __init__(self):
+        self._next_sweep = 0.0
+
+    async def hit(self, key: str, limit: RateLimit) -> tuple:
+        now = time()
+        table = RateLimitBucket.__table__
+
+        async with AsyncSessionLocal() as db:
+            insert = (postgresql if db.bind.dialect.name == "postgresql" else sqlite).insert
+            now_param = literal(now)
+
+            # Recarga proporcional ao tempo parado, limitada à capacidade
+            refilled = table.c.tokens + (now_param - table.c.updated_at) * limit.rate
+            refilled = case((refilled > limit.capacity, float(limit.capacity)), else_=refilled)
+
+            stmt = insert(table).values(
+                key=key, tokens=float(limit.capacity - 1), updated_at=now, allowed=True
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.key],
+                set_={
+                    "tokens": case((refilled >= 1, refilled - 1), else_=refilled),
+                    "allowed": refilled >= 1,
+                    "updated_at": now_param,
+                },
+            ).returning(table.c.allowed, table.c.tokens)
+
+            row = (await db.execute(stmt)).one()
+
+            # Remove baldes ociosos de tempos em tempos (parados há mais que
+            # IDLE_KEY_SECONDS já estariam cheios para janelas de até 1 dia)
+            if monotonic() >= self._next_sweep:
+                self._next_sweep = monotonic() + 60
+                await db.execute(delete(table).where(table.c.updated_at < now - IDLE_KEY_SECONDS))
+
+            await db.commit()
+
+        return bool(row.allowed), row.tokens
+
+
+_backend = SQLBackend() if RATE_LIMIT_BACKEND == "sql" else MemoryBackend()
+
+
+# ============================
+# DEPENDÊNCIA POR ROTA
+# ============================
+def client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+def rate_limit(
+    name: str,
+    guest: Optional[RateLimit] = None,
+    user: Optional[RateLimit] = None,
+    message: str = "Limite de requisições atingido."
+):
+    """
+    Dependência FastAPI que aplica o limite da rota: `guest` por IP para
+    visitantes, `user` por id para logados (None = sem limite). Quando
+    estoura, responde 429 com o header Retry-After.
+    """
+    async def dependency(request: Request, current_user=Depends(get_current_user)):
+        if current_user:
+            limit, key = user, f"{name}:user:{current_user.id}"
+        else:
+            limit, key = guest, f"{name}:ip:{client_ip(request)}"
+
+        if limit is None:
+            return
+
+        allowed, tokens = await _backend.hit(key, limit)
+        if not allowed:
+            RATE_LIMITED.inc(limit=name, client="user" if current_user else "guest")
+            retry_after = max(1, math.ceil((1 - tokens) / limit.rate))
+            raise HTTPException(
+                status_code=429,
+                detail={"message": message, "retry_after": retry_after},
+                headers={"Retry-After": str(retry_after)}
+            )
+
+    return dependency
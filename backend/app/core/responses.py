@@ -0,0 +1,79 @@
+"""
+Respostas JSON das rotas com histórico (/conversations).
+
+- Serialização direto para bytes pelo pydantic-core (TypeAdapter.dump_json),
+  sem o caminho padrão do FastAPI (dict intermediário + json.dumps).
+- Compressão negociada pelo Accept-Encoding acima de
+  RESPONSE_COMPRESS_MIN_BYTES: brotli (se instalado) ou gzip. Respostas
+  longas de tutoria comprimem muito bem.
+
+Benchmark: python -m benchmarks.history_payload
+"""
+import gzip
+from typing import Any
+
+import anyio.to_thread
+from pydantic import TypeAdapter
+from starlette.datastructures import Headers
+from starlette.responses import Response
+
+from app.core.config import RESPONSE_COMPRESS_MIN_BYTES, RESPONSE_GZIP_LEVEL, RESPONSE_BROTLI_QUALITY
+from app.core.metrics import timed
+from app.core.static import accepted_encodings
+
+try:
+    import brotli  # opcional
+except ImportError:
+    brotli = None
+
+# Acima disso a compressão roda numa thread para não travar o event loop
+_OFFLOAD_BYTES = 256 * 1024
+
+
+def choose_encoding(accept_encoding: str):
+    accepted = accepted_encodings(accept_encoding)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=RESPONSE_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=RESPONSE_GZIP_LEVEL, mtime=0)
+
+
+class CompressedJSONResponse(Response):
+    """JSON já serializado; comprime na hora do envio, conforme o cliente"""
+    media_type = "application/json"
+
+    async def __call__(self, scope, receive, send):
+        if len(self.body) >= RESPONSE_COMPRESS_MIN_BYTES and "content-encoding" not in self.headers:
+            self.headers.add_vary_header("Accept-Encoding")
+            encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+
+            if encoding:
+                with timed("compress"):
+                    if len(self.body) > _OFFLOAD_BYTES:
+                        body = await anyio.to_thread.run_sync(compress, self.body, encoding)
+                    else:
+                        body = compress(self.body, encoding)
+
+                self.body = body
+                self.headers["content-encoding"] = encoding
+                self.headers["content-length"] = str(len(body))
+
+        await super().__call__(scope, receive, send)
+
+
+def json_response(adapter: TypeAdapter, data: Any) -> CompressedJSONResponse:
+    """
+    Valida `data` (objetos ORM, Rows ou dicts) com o schema de `adapter` e
+    serializa em bytes. Retornar a Response pronta faz o FastAPI pular a
+    própria serialização (o response_model da rota fica só na documentação).
+    """
+    with timed("serialize"):
+        body = adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+    return CompressedJSONResponse(body)
@@ -1,9 +1,17 @@
+import asyncio
 import bcrypt
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
+from fastapi import HTTPException
 from jose import jwt
 import os
 from typing import Optional
 
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import BCRYPT_ROUNDS, HASH_WORKERS, HASH_MAX_PENDING, HASH_QUEUE_TIMEOUT
+
 SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
@@ -17,7 +25,7 @@ def get_password_hash(password: str) -> str:
     Usado pelo novo sistema de rotas (routes/auth.py).
     """
     password_bytes = password.encode('utf-8')
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password_bytes, salt)
     return hashed.decode('utf-8')
 
@@ -37,6 +45,72 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     hashed_bytes = hashed_password.encode('utf-8')
     return bcrypt.checkpw(password_bytes, hashed_bytes)
 
+
+def needs_rehash(hashed_password: str) -> bool:
+    """True se o hash foi gerado com um custo diferente de BCRYPT_ROUNDS"""
+    try:
+        return int(hashed_password.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+# ========================================================
+# 3.1 HASH FORA DO WORKER (POOL DE PROCESSOS)
+# ========================================================
+# bcrypt é CPU pura: roda num pool de processos pequeno e limitado. Se já
+# houver HASH_MAX_PENDING operações na fila por mais de HASH_QUEUE_TIMEOUT
+# segundos, responde 503 em vez de acumular requisições.
+_hash_pool: Optional[ProcessPoolExecutor] = None
+_hash_slots: Optional[asyncio.Semaphore] = None
+
+
+def _get_hash_pool() -> ProcessPoolExecutor:
+    global _hash_pool
+    if _hash_pool is None:
+        # spawn: não herda threads/conexões do processo da API
+        _hash_pool = ProcessPoolExecutor(
+            max_workers=HASH_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _hash_pool
+
+
+def shutdown_hash_pool():
+    global _hash_pool
+    if _hash_pool is not None:
+        _hash_pool.shutdown(wait=False, cancel_futures=True)
+        _hash_pool = None
+
+
+async def _run_hash(func, *args):
+    global _hash_slots
+    if _hash_slots is None:
+        _hash_slots = asyncio.Semaphore(HASH_MAX_PENDING)
+
+    try:
+        await asyncio.wait_for(_hash_slots.acquire(), timeout=HASH_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=503,
+            detail="Servidor ocupado, tente novamente em instantes.",
+            headers={"Retry-After": str(max(1, int(HASH_QUEUE_TIMEOUT)))}
+        )
+
+    try:
+        if HASH_WORKERS <= 0:
+            return await run_in_threadpool(func, *args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_hash_pool(), func, *args)
+    finally:
+        _hash_slots.release()
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_hash(get_password_hash, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_hash(verify_password, plain_password, hashed_password)
+
 # ========================================================
 # 4. CRIAÇÃO DE TOKEN JWT
 # ========================================================
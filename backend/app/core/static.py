@@ -0,0 +1,93 @@
+"""
+Arquivos estáticos com cache agressivo e versões pré-comprimidas.
+
+- Nomes com hash do conteúdo (ex.: "auth.3f2a9c1d7e.js", gerados por
+  `python -m app.core.assets build`, e "uploads/images/<sha256>.jpg") nunca
+  mudam de conteúdo: Cache-Control immutable por 1 ano.
+- Os demais (páginas HTML, i18n, fotos antigas) são revalidados a cada uso
+  com ETag forte (hash do conteúdo): repetição vira um 304 sem corpo.
+- Se existir "<arquivo>.br" ou "<arquivo>.gz" e o cliente aceitar, serve a
+  versão comprimida pronta (sem comprimir a cada request).
+- Range (retomar downloads, vídeo) fica a cargo do FileResponse do Starlette.
+"""
+import hashlib
+import os
+import re
+from functools import lru_cache
+from mimetypes import guess_type
+
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse
+
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# "nome.<10 hex>.ext" (build do frontend) ou "<64 hex>[_<lado>].ext" (uploads)
+_FINGERPRINTED = re.compile(r"(\.[0-9a-f]{10}\.[A-Za-z0-9]+|/[0-9a-f]{64}(_\d+)?\.[A-Za-z0-9]+)$")
+
+# Ordem de preferência das versões pré-comprimidas
+_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def is_fingerprinted(path: str) -> bool:
+    return bool(_FINGERPRINTED.search(path.replace(os.sep, "/")))
+
+
+def accepted_encodings(header: str) -> set:
+    """"gzip, br;q=0" -> {"gzip"} (q=0 significa recusado)"""
+    accepted = set()
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        if name:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+@lru_cache(maxsize=4096)
+def _content_hash(path: str, mtime_ns: int, size: int) -> str:
+    # mtime/tamanho na chave: arquivo alterado -> novo hash
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:32]
+
+
+class CachedStaticFiles(StaticFiles):
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        request_headers = Headers(scope=scope)
+        path = str(full_path)
+        media_type = guess_type(path)[0] or "text/plain"
+
+        headers = {"Cache-Control": IMMUTABLE if is_fingerprinted(path) else REVALIDATE}
+
+        variants = [(enc, path + suffix) for enc, suffix in _ENCODINGS if os.path.isfile(path + suffix)]
+        if variants:
+            headers["Vary"] = "Accept-Encoding"
+            accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+            for enc, variant in variants:
+                if enc in accepted:
+                    path = variant
+                    stat_result = os.stat(variant)
+                    headers["Content-Encoding"] = enc
+                    break
+
+        # ETag forte e distinto por representação (original, br, gzip)
+        tag = _content_hash(path, stat_result.st_mtime_ns, stat_result.st_size)
+        headers["ETag"] = f'"{tag}"'
+
+        response = FileResponse(
+            path,
+            status_code=status_code,
+            headers=headers,
+            media_type=media_type,
+            stat_result=stat_result,
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -1,33 +1,202 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
-import os
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from time import perf_counter
+import asyncio
+
+from app.core.cache import TTLCache
+from app.core.config import (
+    DATABASE_URL,
+    DATABASE_REPLICA_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    READ_YOUR_WRITES_SECONDS,
+)
+from app.core.metrics import gauge, histogram, register_collector, observe_stage
 
 # -----------------------------------------------------------------------------
-# Banco de dados - Railway PostgreSQL
+# Banco de dados - Railway PostgreSQL (SQLite local se DATABASE_URL não vier)
 # -----------------------------------------------------------------------------
+# Nada aqui abre conexão: os engines conectam no primeiro uso ou em
+# warm_up_pools(), chamado pelo lifespan da API.
 
-DATABASE_URL = os.getenv("DATABASE_URL")
+def _normalize_url(url: str) -> str:
+    # Corrige prefixo antigo caso Railway forneça postgres://
+    if url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://", 1)
 
-if not DATABASE_URL:
-    raise ValueError("DATABASE_URL não configurada")
+    # Remove parâmetros extras como ?sslmode=require
+    if "?sslmode=" in url:
+        url = url.split("?")[0]
 
-# Corrige prefixo antigo caso Railway forneça postgres://
-if DATABASE_URL.startswith("postgres://"):
-    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+    return url
 
-# Remove parâmetros extras como ?sslmode=require
-if "?sslmode=" in DATABASE_URL:
-    DATABASE_URL = DATABASE_URL.split("?")[0]
+DATABASE_URL = _normalize_url(DATABASE_URL)
 
-# Cria engine PostgreSQL
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True
+# -----------------------------------------------------------------------------
+# Pool de conexões (DB_POOL_*), com o tempo de checkout medido
+# -----------------------------------------------------------------------------
+# Cada processo tem até DB_POOL_SIZE + DB_MAX_OVERFLOW conexões por engine
+# (sync, async e, se houver, réplica). A espera por uma conexão livre (ou
+# pela abertura de uma nova) vai para atena_db_pool_wait_seconds e para o
+# Server-Timing do request ("db_pool_wait").
+POOL_WAIT = histogram(
+    "atena_db_pool_wait_seconds", "Espera pelo checkout de uma conexão do pool", ("engine",),
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
 )
 
+
+def _timed_pool(base, name: str):
+    class TimedPool(base):
+        def _do_get(self):
+            start = perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                waited = perf_counter() - start
+                POOL_WAIT.observe(waited, engine=name)
+                observe_stage("db_pool_wait", waited)
+
+    TimedPool.__name__ = f"Timed{base.__name__}"
+    return TimedPool
+
+
+def _engine_options(url: str, name: str, pool_class=QueuePool) -> dict:
+    options = {"pool_pre_ping": True}
+    # SQLite (desenvolvimento) fica com o pool padrão do SQLAlchemy
+    if not url.startswith("sqlite"):
+        options.update(
+            poolclass=_timed_pool(pool_class, name),
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+    return options
+
+# Cria engine PostgreSQL
+engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL, "sync"))
+
 # Sessão
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# -----------------------------------------------------------------------------
+# Réplica de leitura (opcional) + read-your-writes
+# -----------------------------------------------------------------------------
+# Rotas só de leitura usam get_read_db (app/core/dependencies.py). Quem
+# acabou de gravar um turno do chat continua lendo do primário por
+# READ_YOUR_WRITES_SECONDS, para não ver a própria mensagem sumir por causa
+# do atraso da replicação. A marcação é por processo: com vários workers,
+# use afinidade de sessão ou uma janela maior que o atraso típico da réplica.
+if DATABASE_REPLICA_URL:
+    REPLICA_URL = _normalize_url(DATABASE_REPLICA_URL)
+    replica_engine = create_engine(REPLICA_URL, **_engine_options(REPLICA_URL, "replica"))
+else:
+    REPLICA_URL = None
+    replica_engine = engine
+
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+
+_recent_writers = TTLCache(maxsize=100_000, ttl=READ_YOUR_WRITES_SECONDS)
+
+
+def note_write(user_id):
+    """O usuário acabou de gravar: leituras dele vão ao primário por um tempo"""
+    if REPLICA_URL and user_id is not None:
+        _recent_writers.set(str(user_id), True)
+
+
+def read_session_for(subject) -> sessionmaker:
+    """Sessão de leitura para o "sub" do token (None = anônimo)"""
+    if REPLICA_URL is None or (subject is not None and _recent_writers.get(str(subject))):
+        return SessionLocal
+    return ReadSessionLocal
+
+# -----------------------------------------------------------------------------
+# Engine assíncrona (rotas de chat) - mesmo banco, driver async
+# -----------------------------------------------------------------------------
+
+def _async_url(url: str) -> str:
+    """Troca o driver da URL pelo equivalente assíncrono"""
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    return url
+
+ASYNC_DATABASE_URL = _async_url(DATABASE_URL)
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    **_engine_options(ASYNC_DATABASE_URL, "async", AsyncAdaptedQueuePool)
+)
+
+# expire_on_commit=False: objetos continuam legíveis após o commit sem novo SELECT
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+# SQLite só respeita ON DELETE CASCADE com foreign_keys ligado (por conexão)
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+if DATABASE_URL.startswith("sqlite"):
+    event.listen(engine, "connect", _enable_sqlite_foreign_keys)
+    event.listen(async_engine.sync_engine, "connect", _enable_sqlite_foreign_keys)
+
+# -----------------------------------------------------------------------------
+# Métricas do pool de conexões (lidas a cada coleta do /metrics)
+# -----------------------------------------------------------------------------
+DB_POOL = gauge("atena_db_pool_connections", "Conexões do pool por estado", ("engine", "state"))
+
+@register_collector
+def _collect_pool_stats():
+    pools = [("sync", engine.pool), ("async", async_engine.sync_engine.pool)]
+    if replica_engine is not engine:
+        pools.append(("replica", replica_engine.pool))
+    for name, pool in pools:
+        # NullPool/StaticPool (SQLite em memória) não têm esses contadores
+        for state, method in (("size", "size"), ("checked_out", "checkedout"),
+                              ("idle", "checkedin"), ("overflow", "overflow")):
+            if hasattr(pool, method):
+                DB_POOL.set(getattr(pool, method)(), engine=name, state=state)
+
+# -----------------------------------------------------------------------------
+# Aquecimento (lifespan): conexões prontas antes do primeiro request
+# -----------------------------------------------------------------------------
+async def warm_up_pools(connections: int):
+    """Abre `connections` conexões em cada pool (e na réplica) e as devolve ociosas"""
+    if connections <= 0:
+        return
+
+    def _warm_sync(target):
+        # Abertas ao mesmo tempo: senão o pool reaproveitaria uma só
+        conns = [target.connect() for _ in range(connections)]
+        try:
+            for conn in conns:
+                conn.execute(text("SELECT 1"))
+        finally:
+            for conn in conns:
+                conn.close()
+
+    async def _warm_async():
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    engines = [engine] if replica_engine is engine else [engine, replica_engine]
+    await asyncio.gather(
+        *(asyncio.to_thread(_warm_sync, target) for target in engines),
+        *(_warm_async() for _ in range(connections))
+    )
+
 # Base dos models
 Base = declarative_base()
 
@@ -38,3 +207,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
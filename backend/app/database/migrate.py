@@ -0,0 +1,132 @@
+"""
+Migrações versionadas do banco.
+
+Cada arquivo em app/database/migrations/ (ex.: 0001_initial.py) expõe
+`upgrade(conn)` e é aplicado uma única vez, em ordem, dentro de uma
+transação. As versões aplicadas ficam na tabela `schema_migrations`.
+
+Uso (a partir de backend/):
+    python -m app.database.migrate upgrade   # aplica as pendentes
+    python -m app.database.migrate check     # lista pendentes (exit 1 se houver)
+    python -m app.database.migrate status    # aplicadas x pendentes
+"""
+import importlib
+import logging
+import pkgutil
+import sys
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, inspect, text
+from sqlalchemy.engine import Engine
+
+from app.database import migrations
+
+logger = logging.getLogger(__name__)
+
+# Lock de migração no Postgres (evita dois workers migrando ao mesmo tempo)
+ADVISORY_LOCK_ID = 20260118
+
+_meta = MetaData()
+schema_migrations = Table(
+    "schema_migrations", _meta,
+    Column("version", String, primary_key=True),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def available_migrations() -> list:
+    """[(versão, módulo)] em ordem"""
+    found = []
+    for info in pkgutil.iter_modules(migrations.__path__):
+        if info.name[:4].isdigit():
+            module = importlib.import_module(f"{migrations.__name__}.{info.name}")
+            found.append((info.name, module))
+    return sorted(found, key=lambda item: item[0])
+
+
+def applied_versions(conn) -> set:
+    if not inspect(conn).has_table("schema_migrations"):
+        return set()
+    return {row.version for row in conn.execute(schema_migrations.select())}
+
+
+def pending_migrations(engine: Engine) -> list:
+    with engine.connect() as conn:
+        applied = applied_versions(conn)
+    return [version for version, _ in available_migrations() if version not in applied]
+
+
+def upgrade(engine: Engine) -> list:
+    """Aplica as migrações pendentes e devolve as versões aplicadas"""
+    applied_now = []
+
+    with engine.connect() as lock_conn:
+        if engine.dialect.name == "postgresql":
+            lock_conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": ADVISORY_LOCK_ID})
+            lock_conn.commit()
+
+        try:
+            with engine.begin() as conn:
+                _meta.create_all(conn, checkfirst=True)
+
+            for version, module in available_migrations():
+                with engine.begin() as conn:
+                    if version in applied_versions(conn):
+                        continue
+
+                    logger.info(f"Aplicando migração {version}")
+                    module.upgrade(conn)
+                    conn.execute(schema_migrations.insert().values(
+                        version=version, applied_at=datetime.utcnow()
+                    ))
+                    applied_now.append(version)
+        finally:
+            if engine.dialect.name == "postgresql":
+                lock_conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": ADVISORY_LOCK_ID})
+                lock_conn.commit()
+
+    # Migrações podem mexer em PRAGMAs/estado da conexão (SQLite)
+    if applied_now:
+        engine.dispose()
+
+    return applied_now
+
+
+def main(argv: list) -> int:
+    from app.database.database import engine
+
+    command = argv[0] if argv else "status"
+    known = {version for version, _ in available_migrations()}
+
+    if command == "upgrade":
+        done = upgrade(engine)
+        print(f"{len(done)} migração(ões) aplicada(s): {', '.join(done) or '-'}")
+        return 0
+
+    if command in ("check", "status"):
+        with engine.connect() as conn:
+            applied = applied_versions(conn)
+        pending = sorted(known - applied)
+        unknown = sorted(applied - known)
+
+        if command == "status":
+            for version in sorted(known):
+                print(f"[{'x' if version in applied else ' '}] {version}")
+        for version in pending:
+            print(f"PENDENTE: {version}")
+        for version in unknown:
+            print(f"DESCONHECIDA (aplicada no banco, ausente no código): {version}")
+
+        if command == "check":
+            if not pending and not unknown:
+                print("Banco atualizado.")
+            return 1 if pending else 0
+        return 0
+
+    print(__doc__)
+    return 2
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,43 @@
+"""Esquema inicial (users, conversations, messages) — equivalente ao antigo create_all."""
+from sqlalchemy import (
+    Column, Date, DateTime, ForeignKey, Integer, MetaData, String, Table, Text, func,
+)
+
+
+def upgrade(conn):
+    meta = MetaData()
+
+    Table(
+        "users", meta,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("email", String, unique=True, index=True, nullable=False),
+        Column("hashed_password", String, nullable=False),
+        Column("full_name", String, nullable=False),
+        Column("account_type", String, nullable=False),
+        Column("nickname", String, nullable=True),
+        Column("interests", Text, nullable=True),
+        Column("profile_image", String, nullable=True),
+        Column("gender", String, nullable=True),
+        Column("birth_date", Date, nullable=True),
+    )
+
+    Table(
+        "conversations", meta,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+        Column("title", String, nullable=True),
+        Column("created_at", DateTime(timezone=True), server_default=func.now()),
+        Column("updated_at", DateTime(timezone=True)),
+    )
+
+    Table(
+        "messages", meta,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("conversation_id", Integer, ForeignKey("conversations.id"), nullable=False),
+        Column("role", String, nullable=False),
+        Column("content", Text, nullable=False),
+        Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    )
+
+    # Bancos criados pelo create_all antigo já têm as tabelas: nada a fazer
+    meta.create_all(conn, checkfirst=True)
@@ -0,0 +1,8 @@
+"""messages.token_count: estimativa de tokens usada pela janela de contexto."""
+from sqlalchemy import inspect, text
+
+
+def upgrade(conn):
+    columns = {c["name"] for c in inspect(conn).get_columns("messages")}
+    if "token_count" not in columns:
+        conn.execute(text("ALTER TABLE messages ADD COLUMN token_count INTEGER"))
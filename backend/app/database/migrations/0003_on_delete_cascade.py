@@ -0,0 +1,81 @@
+"""Chaves estrangeiras com ON DELETE CASCADE (users -> conversations -> messages)."""
+import logging
+
+from sqlalchemy import inspect, text
+
+logger = logging.getLogger(__name__)
+
+CASCADES = [
+    # (tabela, coluna, tabela referenciada)
+    ("conversations", "user_id", "users"),
+    ("messages", "conversation_id", "conversations"),
+]
+
+
+def upgrade(conn):
+    if conn.dialect.name == "sqlite":
+        _upgrade_sqlite(conn)
+        return
+
+    inspector = inspect(conn)
+    for table, column, referred in CASCADES:
+        for fk in inspector.get_foreign_keys(table):
+            if fk["constrained_columns"] == [column] and fk.get("name"):
+                conn.execute(text(f'ALTER TABLE {table} DROP CONSTRAINT "{fk["name"]}"'))
+
+        conn.execute(text(
+            f"ALTER TABLE {table} ADD CONSTRAINT {table}_{column}_fkey "
+            f"FOREIGN KEY ({column}) REFERENCES {referred} (id) ON DELETE CASCADE"
+        ))
+
+
+# SQLite não altera constraints: recria as tabelas (procedimento oficial de
+# 12 passos), com foreign_keys desligado para o DROP não disparar cascatas.
+SQLITE_TABLES = {
+    "conversations": (
+        """
+        CREATE TABLE conversations_new (
+            id INTEGER NOT NULL PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+            title VARCHAR,
+            created_at DATETIME DEFAULT (CURRENT_TIMESTAMP),
+            updated_at DATETIME
+        )
+        """,
+        "id, user_id, title, created_at, updated_at",
+    ),
+    "messages": (
+        """
+        CREATE TABLE messages_new (
+            id INTEGER NOT NULL PRIMARY KEY,
+            conversation_id INTEGER NOT NULL REFERENCES conversations (id) ON DELETE CASCADE,
+            role VARCHAR NOT NULL,
+            content TEXT NOT NULL,
+            token_count INTEGER,
+            created_at DATETIME DEFAULT (CURRENT_TIMESTAMP)
+        )
+        """,
+        "id, conversation_id, role, content, token_count, created_at",
+    ),
+}
+
+
+def _upgrade_sqlite(conn):
+    conn.exec_driver_sql("PRAGMA foreign_keys=OFF")
+    if conn.exec_driver_sql("PRAGMA foreign_keys").scalar():
+        raise RuntimeError("Não foi possível desligar foreign_keys para recriar as tabelas")
+
+    try:
+        for table, (create_sql, columns) in SQLITE_TABLES.items():
+            conn.exec_driver_sql(create_sql)
+            conn.exec_driver_sql(f"INSERT INTO {table}_new ({columns}) SELECT {columns} FROM {table}")
+            conn.exec_driver_sql(f"DROP TABLE {table}")
+            conn.exec_driver_sql(f"ALTER TABLE {table}_new RENAME TO {table}")
+            conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS ix_{table}_id ON {table} (id)")
+
+        violations = conn.exec_driver_sql("PRAGMA foreign_key_check").fetchall()
+        if violations:
+            logger.warning(f"{len(violations)} registro(s) órfão(s) após recriar tabelas")
+    finally:
+        # Dentro da transação é no-op; o runner descarta as conexões do pool
+        conn.exec_driver_sql("PRAGMA foreign_keys=ON")
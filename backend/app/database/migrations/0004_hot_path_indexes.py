@@ -0,0 +1,16 @@
+"""Índices compostos das consultas quentes (histórico e lista de conversas)."""
+from sqlalchemy import text
+
+
+def upgrade(conn):
+    # Histórico: WHERE conversation_id = ? ORDER BY created_at
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_messages_conversation_created "
+        "ON messages (conversation_id, created_at)"
+    ))
+
+    # Barra lateral: WHERE user_id = ? ORDER BY updated_at DESC
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_conversations_user_updated "
+        "ON conversations (user_id, updated_at DESC)"
+    ))
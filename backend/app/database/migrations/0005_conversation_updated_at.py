@@ -0,0 +1,9 @@
+"""conversations.updated_at nunca nulo (chave da paginação por cursor)."""
+from sqlalchemy import text
+
+
+def upgrade(conn):
+    conn.execute(text(
+        "UPDATE conversations SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP) "
+        "WHERE updated_at IS NULL"
+    ))
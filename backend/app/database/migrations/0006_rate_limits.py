@@ -0,0 +1,14 @@
+"""Tabela rate_limits: token buckets compartilhados entre workers."""
+from sqlalchemy import Boolean, Column, Float, MetaData, String, Table
+
+
+def upgrade(conn):
+    meta = MetaData()
+    Table(
+        "rate_limits", meta,
+        Column("key", String, primary_key=True),
+        Column("tokens", Float, nullable=False),
+        Column("updated_at", Float, nullable=False, index=True),
+        Column("allowed", Boolean, nullable=False, default=True),
+    )
+    meta.create_all(conn, checkfirst=True)
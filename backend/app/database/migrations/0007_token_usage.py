@@ -0,0 +1,21 @@
+"""Tokens por resposta (messages) e consolidado diário por usuário (token_usage_daily)."""
+from sqlalchemy import BigInteger, Column, Date, ForeignKey, Integer, MetaData, Table, inspect, text
+
+
+def upgrade(conn):
+    columns = {c["name"] for c in inspect(conn).get_columns("messages")}
+    for name in ("prompt_tokens", "completion_tokens"):
+        if name not in columns:
+            conn.execute(text(f"ALTER TABLE messages ADD COLUMN {name} INTEGER"))
+
+    meta = MetaData()
+    Table("users", meta, Column("id", Integer, primary_key=True))
+    Table(
+        "token_usage_daily", meta,
+        Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+        Column("day", Date, primary_key=True),
+        Column("prompt_tokens", BigInteger, nullable=False, default=0),
+        Column("completion_tokens", BigInteger, nullable=False, default=0),
+        Column("requests", Integer, nullable=False, default=0),
+    )
+    meta.tables["token_usage_daily"].create(conn, checkfirst=True)
@@ -0,0 +1,56 @@
+"""Busca textual nas mensagens: tsvector + GIN (Postgres) ou FTS5 (SQLite)."""
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+logger = logging.getLogger(__name__)
+
+
+def upgrade(conn):
+    if conn.dialect.name == "sqlite":
+        _upgrade_sqlite(conn)
+        return
+
+    # Coluna gerada (Postgres 12+): mantida pelo próprio banco em todo
+    # INSERT/UPDATE, com os dicionários de português e inglês (stemming dos
+    # dois idiomas do app)
+    conn.execute(text(
+        "ALTER TABLE messages ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        "GENERATED ALWAYS AS ("
+        "to_tsvector('portuguese', coalesce(content, '')) || "
+        "to_tsvector('english', coalesce(content, ''))"
+        ") STORED"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_messages_search ON messages USING GIN (search_vector)"
+    ))
+
+
+def _upgrade_sqlite(conn):
+    # Índice FTS5 "external content": guarda só o índice, o texto fica em
+    # messages; triggers o mantêm em dia
+    try:
+        conn.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5("
+            "content, content='messages', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 2')"
+        ))
+    except OperationalError as e:
+        logger.warning(f"SQLite sem FTS5, busca desativada: {e}")
+        return
+
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN "
+        "INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content); END"
+    ))
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN "
+        "INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content); END"
+    ))
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content ON messages BEGIN "
+        "INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content); "
+        "INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content); END"
+    ))
+    conn.execute(text("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')"))
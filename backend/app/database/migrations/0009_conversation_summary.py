@@ -0,0 +1,10 @@
+"""Resumo acumulado das conversas longas (conversations.summary / summary_until_id)."""
+from sqlalchemy import inspect, text
+
+
+def upgrade(conn):
+    columns = {c["name"] for c in inspect(conn).get_columns("conversations")}
+    if "summary" not in columns:
+        conn.execute(text("ALTER TABLE conversations ADD COLUMN summary TEXT"))
+    if "summary_until_id" not in columns:
+        conn.execute(text("ALTER TABLE conversations ADD COLUMN summary_until_id INTEGER"))
@@ -0,0 +1 @@
+"""Versões de migração (NNNN_descricao.py), aplicadas por app.database.migrate."""
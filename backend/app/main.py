@@ -1,18 +1,37 @@
+from time import perf_counter
+_import_started = perf_counter()  # antes dos demais imports: mede o `import app.main`
+
 import os
+import asyncio
 import logging
+from contextlib import asynccontextmanager, contextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-
-from app.core.config import CORS_ORIGINS, API_VERSION
-from app.database.database import Base, engine
 
-Base.metadata.create_all(bind=engine)
+from app.core.config import (
+    CORS_ORIGINS, API_VERSION, AUTO_MIGRATE, DB_WARMUP_CONNECTIONS,
+    METRICS_ENABLED, UPLOAD_DIR, FRONTEND_DIR, PROFILE_IMAGE_MAX_BYTES
+)
+from app.core.metrics import MetricsMiddleware, render_metrics, gauge
+from app.core.static import CachedStaticFiles
+from app.core.body_limit import BodySizeLimitMiddleware
+from app.services.media import PROFILE_FORM_OVERHEAD_BYTES
+from app.database.database import engine, warm_up_pools
 
 # ===== ROUTERS =====
 from app.routes.chat import router as chat_router
 from app.routes.conversations import router as conversations_router
 from app.routes.auth import router as auth_router
+from app.services.history_cache import history_cache, summary_cache
+from app.services.answer_cache import answer_cache
+from app.core.dependencies import user_cache, token_cache
+from app.core.security import shutdown_hash_pool
+from app.services.llm_gate import llm_gate
+from app.services.circuit_breaker import breaker_stats
+from app.services.write_behind import turn_writer
+from app.services.ai_service import warm_up as warm_up_ai
+from app.services.summarizer import summaries
 
 # =========================
 # LOGGING
@@ -20,30 +39,92 @@ from app.routes.auth import router as auth_router
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# =========================
+# STARTUP (LIFESPAN)
+# =========================
+# Importar o app não toca no banco nem na OpenAI. Antes de aceitar tráfego
+# o lifespan aplica migrações (só com AUTO_MIGRATE), abre conexões nos pools
+# e cria o cliente da IA, os dois em paralelo. A duração de cada etapa fica
+# em /health ("startup") e no /metrics; o perfil dos imports está em
+# `python -m benchmarks.cold_start`.
+STARTUP_SECONDS = gauge("atena_startup_seconds", "Duração das etapas da subida", ("phase",))
+startup_report = {}
+
+
+@contextmanager
+def _startup_phase(name: str):
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        startup_report[name] = round(perf_counter() - start, 4)
+        STARTUP_SECONDS.set(startup_report[name], phase=name)
+
+
+async def _warm_db():
+    with _startup_phase("warm_db"):
+        try:
+            await warm_up_pools(DB_WARMUP_CONNECTIONS)
+        except Exception as e:
+            # Banco fora do ar na subida: os requests tentam de novo (pool_pre_ping)
+            logger.error(f"Falha ao aquecer o pool do banco: {e!r}")
+
+
+async def _warm_ai():
+    with _startup_phase("warm_ai"):
+        if not await warm_up_ai():
+            logger.warning("Cliente da IA não criado na subida (OPENAI_API_KEY ausente)")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    with _startup_phase("lifespan"):
+        if AUTO_MIGRATE:
+            from app.database.migrate import upgrade  # só carrega as migrações se for aplicar
+
+            with _startup_phase("migrate"):
+                await asyncio.to_thread(upgrade, engine)
+
+        await asyncio.gather(_warm_db(), _warm_ai())
+
+    logger.info(f"API pronta: {startup_report}")
+    yield
+
+    await turn_writer.close()  # grava turnos pendentes do write-behind
+    await summaries.close()
+    shutdown_hash_pool()
+
 # =========================
 # APP INITIALIZATION
 # =========================
 app = FastAPI(
     title="AtenaAI API",
     description="API de chat com integração de IA",
-    version=API_VERSION
+    version=API_VERSION,
+    lifespan=lifespan
 )
 
 # =========================
 # MIDDLEWARE (CORS)
 # =========================
+# Adicionado antes do CORS (fica por dentro): o 413 também leva os headers
+# de CORS. Folga para os demais campos do formulário de perfil.
+app.add_middleware(BodySizeLimitMiddleware, limits={
+    "/auth/update-profile": PROFILE_IMAGE_MAX_BYTES + PROFILE_FORM_OVERHEAD_BYTES,
+})
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
-# =========================
-# DATABASE
-# =========================
-Base.metadata.create_all(bind=engine)
+# Latência por rota/etapa + header Server-Timing (ver app/core/metrics.py)
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
 
 # =========================
 # ROUTERS
@@ -55,18 +136,49 @@ app.include_router(conversations_router)
 # =========================
 # STATIC FILES
 # =========================
-if not os.path.exists("uploads"):
-    os.makedirs("uploads")
+if not os.path.exists(UPLOAD_DIR):
+    os.makedirs(UPLOAD_DIR)
 
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# Fotos têm nome = hash do conteúdo: cache immutable (ver app/core/static.py)
+app.mount("/uploads", CachedStaticFiles(directory=UPLOAD_DIR), name="uploads")
 
 # =========================
 # HEALTH CHECKS
 # =========================
-@app.get("/")
-async def root():
-    return {"status": "ok", "message": "AtenaAI API is running"}
+if not FRONTEND_DIR:
+    @app.get("/")
+    async def root():
+        return {"status": "ok", "message": "AtenaAI API is running"}
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "caches": {
+            "history": history_cache.stats(),
+            "summaries": summary_cache.stats(),
+            "users": user_cache.stats(),
+            "tokens": token_cache.stats(),
+            "guest_answers": answer_cache.stats(),
+        },
+        "llm_gate": llm_gate.stats(),
+        "llm_breakers": breaker_stats(),
+        "write_behind": turn_writer.stats(),
+        "summarizer": summaries.stats(),
+        "startup": startup_report
+    }
+
+if METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+# =========================
+# FRONTEND
+# =========================
+# Montado por último: "/" captura tudo que nenhuma rota acima atendeu
+if FRONTEND_DIR:
+    app.mount("/", CachedStaticFiles(directory=FRONTEND_DIR, html=True), name="frontend")
+
+startup_report["import"] = round(perf_counter() - _import_started, 4)
+STARTUP_SECONDS.set(startup_report["import"], phase="import")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database.database import Base
@@ -7,12 +7,25 @@ class Conversation(Base):
     __tablename__ = "conversations"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     title = Column(String, nullable=True)
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Sempre preenchido (paginação por cursor em (updated_at, id))
+    updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
+
+    # Resumo acumulado das mensagens antigas (app/services/summarizer.py) e
+    # o id da última mensagem que ele cobre (migração 0009)
+    summary = Column(Text, nullable=True)
+    summary_until_id = Column(Integer, nullable=True)
 
     # RELACIONAMENTOS (Strings para evitar erro)
     user = relationship("User", back_populates="conversations")
-    messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
\ No newline at end of file
+    messages = relationship(
+        "Message", back_populates="conversation", cascade="all, delete-orphan", passive_deletes=True
+    )
+
+    # Barra lateral: WHERE user_id = ? ORDER BY updated_at DESC (migração 0004)
+    __table_args__ = (
+        Index("ix_conversations_user_updated", "user_id", updated_at.desc()),
+    )
\ No newline at end of file
@@ -1,24 +1,49 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database.database import Base
 
+
+def estimate_tokens(text: str | None) -> int:
+    """
+    Estimativa barata de tokens (~4 caracteres por token + overhead da
+    mensagem no formato de chat). Suficiente para cortar o histórico.
+    """
+    return len(text or "") // 4 + 4
+
+
+def _token_count_default(context):
+    return estimate_tokens(context.get_current_parameters().get("content"))
+
+
 class Message(Base):
     __tablename__ = "messages"
 
     id = Column(Integer, primary_key=True, index=True)
     
     # Chave estrangeira para a tabela de conversas
-    conversation_id = Column(Integer, ForeignKey("conversations.id"), nullable=False)
+    conversation_id = Column(Integer, ForeignKey("conversations.id", ondelete="CASCADE"), nullable=False)
     
     # Papel de quem enviou: 'user', 'assistant' ou 'system'
     role = Column(String, nullable=False)
     
     # Conteúdo da mensagem (Text para suportar mensagens longas)
     content = Column(Text, nullable=False)
+
+    # Estimativa de tokens calculada uma vez no INSERT (janela de contexto)
+    token_count = Column(Integer, nullable=True, default=_token_count_default)
+
+    # Uso real informado pelo provedor (só respostas do assistente)
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
     
     # Data de criação automática
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # ✅ RELACIONAMENTO USANDO STRING (Evita erro de import circular)
-    conversation = relationship("Conversation", back_populates="messages")
\ No newline at end of file
+    conversation = relationship("Conversation", back_populates="messages")
+
+    # Histórico: WHERE conversation_id = ? ORDER BY created_at (migração 0004)
+    __table_args__ = (
+        Index("ix_messages_conversation_created", "conversation_id", "created_at"),
+    )
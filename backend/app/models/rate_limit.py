@@ -0,0 +1,16 @@
+from sqlalchemy import Column, String, Float, Boolean
+from app.database.database import Base
+
+class RateLimitBucket(Base):
+    """Estado do token bucket compartilhado entre workers (backend "sql")"""
+    __tablename__ = "rate_limits"
+
+    # Ex.: "chat:ip:203.0.113.7" ou "chat:user:42"
+    key = Column(String, primary_key=True)
+
+    # Tokens disponíveis e instante (epoch, segundos) da última atualização
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(Float, nullable=False, index=True)
+
+    # Resultado da última tentativa (lido via RETURNING no mesmo UPSERT)
+    allowed = Column(Boolean, nullable=False, default=True)
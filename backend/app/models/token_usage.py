@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, BigInteger, Date, ForeignKey
+from app.database.database import Base
+
+class TokenUsageDaily(Base):
+    """
+    Tokens consumidos por usuário por dia (UTC), somados a cada resposta
+    salva. A cota diária lê uma única linha pela chave primária.
+    """
+    __tablename__ = "token_usage_daily"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+
+    prompt_tokens = Column(BigInteger, nullable=False, default=0)
+    completion_tokens = Column(BigInteger, nullable=False, default=0)
+    requests = Column(Integer, nullable=False, default=0)
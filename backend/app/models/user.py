@@ -24,8 +24,11 @@ class User(Base):
     birth_date = Column(Date, nullable=True)
 
     # 🔥 RELACIONAMENTO COM CHAT
+    # passive_deletes: o banco apaga conversas/mensagens (ON DELETE CASCADE,
+    # migração 0003); o ORM não carrega os filhos só para deletá-los
     conversations = relationship(
         "Conversation",
         back_populates="user",
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan",
+        passive_deletes=True
     )
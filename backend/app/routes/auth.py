@@ -1,21 +1,42 @@
-from fastapi import APIRouter, Depends, Form, HTTPException, status, File, UploadFile
+from fastapi import APIRouter, BackgroundTasks, Depends, Form, HTTPException, Query, status, File, UploadFile
+from sqlalchemy import delete, select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime, timedelta
 import json
-import os
+import logging
 
 # Importações do projeto
-from app.database.database import get_db
+from app.database.database import get_db, get_async_db, note_write
 from app.models.user import User
-from app.core.dependencies import get_current_user
-from app.schemas.user import UserCreate, UserResponse, Token
-from app.core.security import create_access_token, verify_password, get_password_hash, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.core.dependencies import get_current_user, get_current_user_read, invalidate_user_cache
+from app.core.rate_limit import rate_limit, RateLimit
+from app.core.config import LOGIN_LIMIT, TOKEN_QUOTAS
+from app.models.conversation import Conversation
+from app.models.token_usage import TokenUsageDaily
+from app.services.token_usage import today
+from app.services.media import store_image, generate_thumbnails, remove_image
+from app.services.history_cache import invalidate_history
+from app.schemas.user import UserCreate, UserResponse, Token, UsageResponse
+from app.core.security import (
+    create_access_token, verify_password_async, get_password_hash_async,
+    needs_rehash, ACCESS_TOKEN_EXPIRE_MINUTES
+)
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
+# Tentativas de login por IP (bcrypt é caro e é alvo de força bruta)
+login_rate_limit = rate_limit(
+    "login",
+    guest=RateLimit.parse(LOGIN_LIMIT),
+    message="Muitas tentativas de login. Tente novamente em instantes."
+)
+
 # URL BASE (Ajuste para localhost quando estiver testando localmente)
 BASE_URL = "http://127.0.0.1:8000"
 # Para deploy, use: "https://atenaai.onrender.com"
@@ -35,17 +56,17 @@ class EmailCheckResponse(BaseModel):
 # 1. ROTA DE REGISTRO (CRIAR CONTA)
 # ============================
 @router.post("/register", response_model=UserResponse)
-def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     # Verifica se email já existe
-    user_exists = db.query(User).filter(User.email == user.email).first()
+    user_exists = await db.scalar(select(User.id).where(User.email == user.email))
     if user_exists:
         raise HTTPException(
             status_code=400,
             detail="Este email já está registrado."
         )
 
-    # Cria novo usuário com senha hash
-    hashed_password = get_password_hash(user.password)
+    # Cria novo usuário com senha hash (bcrypt no pool de processos)
+    hashed_password = await get_password_hash_async(user.password)
     new_user = User(
         email=user.email,
         hashed_password=hashed_password,
@@ -58,8 +79,10 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
     )
     
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
+    # Leituras logo em seguida (/auth/me) vão ao primário, não à réplica
+    note_write(new_user.id)
     
     return new_user
 
@@ -67,18 +90,32 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
 # ... (mantenha os imports iguais)
 
 # Na ROTA DE LOGIN (Linha 72 aproximadamente):
-@router.post("/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+@router.post("/login", response_model=Token, dependencies=[Depends(login_rate_limit)])
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     # Busca usuário pelo email
-    user = db.query(User).filter(User.email == form_data.username).first()
+    user = await db.scalar(select(User).where(User.email == form_data.username))
     
-    # Verifica senha
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    # Verifica senha (bcrypt no pool de processos)
+    if not user or not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Email ou senha incorretos",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+    # Custo do bcrypt mudou (BCRYPT_ROUNDS): regrava o hash com a senha já validada
+    if needs_rehash(user.hashed_password):
+        try:
+            user.hashed_password = await get_password_hash_async(form_data.password)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            logger.error("Erro ao atualizar hash da senha", exc_info=True)
+
+    # Quem acabou de entrar costuma chamar /auth/me em seguida: lê do
+    # primário por alguns segundos (conta recém-criada ou hash regravado
+    # podem ainda não ter chegado à réplica)
+    note_write(user.id)
     
     # Gera Token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -114,16 +151,50 @@ def check_email(data: EmailCheckRequest, db: Session = Depends(get_db)):
 # 4. PEGAR DADOS DO USUÁRIO (ME)
 # ============================
 @router.get("/me", response_model=UserResponse)
-def get_current_user_info(current_user: User = Depends(get_current_user)):
+def get_current_user_info(current_user: User = Depends(get_current_user_read)):
     """Retorna informações do usuário logado"""
     return current_user
 
 
+# ============================
+# 4.1 CONSUMO DE TOKENS (ÚLTIMOS DIAS)
+# ============================
+@router.get("/me/usage", response_model=UsageResponse)
+async def get_usage(
+    days: int = Query(30, ge=1, le=366),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Lê só o consolidado diário (token_usage_daily), nunca `messages`"""
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Não autenticado")
+
+    rows = (await db.scalars(
+        select(TokenUsageDaily)
+        .where(
+            TokenUsageDaily.user_id == current_user.id,
+            TokenUsageDaily.day > today() - timedelta(days=days)
+        )
+        .order_by(TokenUsageDaily.day.desc())
+    )).all()
+
+    used = sum(r.prompt_tokens + r.completion_tokens for r in rows if r.day == today())
+    quota = TOKEN_QUOTAS.get(current_user.account_type)
+
+    return {
+        "used_today": used,
+        "quota": quota,
+        "remaining": max(0, quota - used) if quota is not None else None,
+        "days": rows,
+    }
+
+
 # ============================
 # 5. ATUALIZAR PERFIL (COM FOTO)
 # ============================
 @router.put("/update-profile", response_model=UserResponse)
 def update_profile(
+    background_tasks: BackgroundTasks,
     full_name: Optional[str] = Form(None),
     nickname: Optional[str] = Form(None),
     email: Optional[str] = Form(None),
@@ -137,8 +208,11 @@ def update_profile(
 ):
     """Atualiza o perfil do usuário logado"""
     
-    # Merge do usuário para a nova sessão
-    user = db.merge(current_user)
+    # Carrega o usuário nesta sessão (current_user pode vir do cache)
+    user = db.get(User, current_user.id)
+    if not user:
+        raise HTTPException(status_code=404, detail="Usuário não encontrado")
+    old_email = user.email
     
     # Atualizar campos básicos
     if full_name and full_name.strip(): user.full_name = full_name.strip()
@@ -162,27 +236,25 @@ def update_profile(
         except json.JSONDecodeError:
             user.interests = interests # Salva como string se falhar
     
-    # Imagem de Perfil
+    # Imagem de Perfil (em blocos, com limite de tamanho; nome = hash do
+    # conteúdo). 413/400 vão para o cliente; miniaturas saem depois da resposta.
     if profile_image and profile_image.filename:
         try:
-            os.makedirs("uploads", exist_ok=True)
-            
-            # Salva arquivo
-            file_extension = os.path.splitext(profile_image.filename)[1]
-            file_name = f"{user.id}_{int(datetime.now().timestamp())}{file_extension}"
-            file_path = f"uploads/{file_name}"
-            
-            with open(file_path, "wb") as f:
-                f.write(profile_image.file.read())
-            
+            relative = store_image(profile_image.file)
+
             # Gera URL (Ajustada para funcionar localmente)
-            user.profile_image = f"{BASE_URL}/{file_path}"
+            user.profile_image = f"{BASE_URL}/uploads/{relative}"
+            background_tasks.add_task(generate_thumbnails, relative)
+        except HTTPException:
+            raise
         except Exception as e:
             print(f"Erro ao salvar imagem: {e}")
     
     db.add(user)
     db.commit()
     db.refresh(user)
+    invalidate_user_cache(user.id, old_email, user.email)
+    note_write(user.id)
     
     return user
 
@@ -195,23 +267,44 @@ def delete_account(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Deleta a conta do usuário logado"""
-    user = db.merge(current_user)
+    """
+    Deleta a conta do usuário logado com um único DELETE: conversas,
+    mensagens e consumo vão junto pelo ON DELETE CASCADE do banco, sem
+    carregar nenhum filho na memória.
+    """
+    user = db.execute(
+        select(User.id, User.email, User.profile_image).where(User.id == current_user.id)
+    ).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="Usuário não encontrado")
     user_id = user.id
-    
-    # Deletar a foto de perfil se existir
+    user_email = user.email
+
+    # Só os ids (inteiros), para limpar o cache de histórico depois
+    conversation_ids = db.scalars(
+        select(Conversation.id).where(Conversation.user_id == user_id)
+    ).all()
+
+    db.execute(delete(User).where(User.id == user_id))
+    db.commit()
+    invalidate_history(*conversation_ids)
+    invalidate_user_cache(user_id, user_email)
+
+    # Deletar a foto de perfil se existir (depois do commit: se o DELETE
+    # falhar, a conta continua com a foto)
     if user.profile_image:
         try:
             # Tenta extrair o caminho do arquivo da URL
             if "uploads/" in user.profile_image:
                 file_part = user.profile_image.split("uploads/")[-1]
-                file_path = f"uploads/{file_part}"
-                if os.path.exists(file_path):
-                    os.remove(file_path)
+
+                # Fotos são deduplicadas pelo hash: só apaga se mais ninguém usa
+                shared = db.scalar(
+                    select(User.id).where(User.profile_image == user.profile_image).limit(1)
+                )
+                if not shared:
+                    remove_image(file_part)
         except Exception as e:
             print(f"Erro ao deletar imagem: {e}")
     
-    db.delete(user)
-    db.commit()
-    
     return {"message": f"Conta do usuário {user_id} deletada com sucesso"}
\ No newline at end of file
@@ -1,16 +1,21 @@
 from fastapi import APIRouter, HTTPException, Depends, Request
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
-from datetime import datetime
-from time import time
 
 # Schemas e Models
 from app.schemas.chat import MessageCreate
-from app.services.ai_service import generate_ai_response
-from app.core.config import MAX_INPUT_LENGTH
-from app.database.database import get_db
-from app.models.message import Message
-from app.models.conversation import Conversation
+from app.services.ai_service import generate_ai_response, stream_ai_response, FALLBACK_REPLY
+from app.services.streaming import stream_reply, ndjson_response, replay_tokens
+from app.services.answer_cache import guest_cache_key, get_cached_answer, cache_answer
+from app.services.chat_service import save_turn, save_streamed_turn
+from app.services.token_usage import enforce_token_quota, estimate_usage
+from app.services.llm_gate import llm_gate, PRIORITY_USER
+from app.services.context_window import load_history_window, trim_to_budget, get_token_budget
+from app.core.config import MAX_INPUT_LENGTH, CHAT_GUEST_LIMIT, CHAT_USER_LIMIT
+from app.core.rate_limit import rate_limit, RateLimit
+from app.core.prompts import user_profile
+from app.database.database import get_async_db
+from app.models.message import estimate_tokens
 from app.models.user import User
 from app.core.dependencies import get_current_user
 
@@ -18,19 +23,21 @@ router = APIRouter(prefix="/chat", tags=["Chat"])
 
 
 # ===========================================================
-# 🔒 RATE LIMIT PARA VISITANTES
+# 🔒 RATE LIMIT (VISITANTES POR IP, LOGADOS POR USUÁRIO)
 # ===========================================================
-guest_requests = {}  # IP -> [timestamps]
+chat_rate_limit = rate_limit(
+    "chat",
+    guest=RateLimit.parse(CHAT_GUEST_LIMIT),
+    user=RateLimit.parse(CHAT_USER_LIMIT),
+    message="Limite de mensagens atingido."
+)
 
-GUEST_LIMIT = 10       # máximo de mensagens
-GUEST_WINDOW = 3600   # 1 hora (segundos)
 
-
-@router.post("/")
+@router.post("/", dependencies=[Depends(chat_rate_limit), Depends(enforce_token_quota)])
 async def chat(
     message: MessageCreate,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: Optional[User] = Depends(get_current_user)
 ):
     # ===========================================================
@@ -45,46 +52,43 @@ async def chat(
         raise HTTPException(status_code=400, detail="Mensagem muito longa")
 
     # ===========================================================
-    # 🔒 RATE LIMIT SE FOR VISITANTE
+    # 🔒 MODO CONVIDADO (SEM BANCO)
     # ===========================================================
     if not current_user:
-        client_ip = request.client.host
-        now = time()
-
-        timestamps = guest_requests.get(client_ip, [])
-        timestamps = [t for t in timestamps if now - t < GUEST_WINDOW]
-
-        if len(timestamps) >= GUEST_LIMIT:
-            # tempo restante até liberar
-            oldest = min(timestamps)
-            retry_after = int(GUEST_WINDOW - (now - oldest))
-
-            raise HTTPException(
-            status_code=429,
-            detail={
-                "message": "Limite de mensagens para visitantes atingido.",
-                "retry_after": retry_after
-            }
+        history = trim_to_budget(
+            [m.model_dump() for m in message.history or []], get_token_budget()
         )
+        formatted_history = history + [{"role": "user", "content": content}]
 
+        # Perguntas repetidas de visitantes saem do cache, sem chamar a IA
+        cache_key = guest_cache_key(message.language, history, content)
+        cached = get_cached_answer(cache_key)
 
-        timestamps.append(now)
-        guest_requests[client_ip] = timestamps
+        if message.stream:
+            if cached is not None:
+                return ndjson_response(stream_reply(replay_tokens(cached)))
 
-    # ===========================================================
-    # 🔒 MODO CONVIDADO (SEM BANCO)
-    # ===========================================================
-    if not current_user:
-        formatted_history = message.history or []
-        formatted_history.append({"role": "user", "content": content})
+            async def on_finish(reply: str, completed: bool):
+                if completed and reply != FALLBACK_REPLY:
+                    cache_answer(cache_key, reply)
+
+            llm_gate.check_capacity()
+            return ndjson_response(stream_reply(
+                stream_ai_response(formatted_history, language=message.language),
+                on_finish=on_finish
+            ))
 
-        ai_response = generate_ai_response(
+        if cached is not None:
+            return {"reply": cached}
+
+        ai_response = await generate_ai_response(
             formatted_history,
-            user_id=None,
-            user_name="Visitante",
             language=message.language
         )
 
+        if ai_response != FALLBACK_REPLY:
+            cache_answer(cache_key, ai_response)
+
         return {"reply": ai_response}
 
     # ===========================================================
@@ -92,65 +96,63 @@ async def chat(
     # ===========================================================
     conv_id = message.conversation_id
 
-    # Cria conversa se não existir
+    # Conversa nova: só é criada no banco junto com o primeiro turno (mesma
+    # transação); até lá não há histórico para carregar
+    new_title = None
     if not conv_id:
-        try:
-            new_title = content[:30] + "..." if len(content) > 30 else content
-            new_conv = Conversation(
-                user_id=current_user.id,
-                title=new_title,
-                created_at=datetime.utcnow(),
-                updated_at=datetime.utcnow()
-            )
-            db.add(new_conv)
-            db.commit()
-            db.refresh(new_conv)
-            conv_id = new_conv.id
-        except Exception as e:
-            db.rollback()
-            print(f"❌ Erro ao criar conversa: {e}")
-            raise HTTPException(status_code=500, detail="Erro ao criar conversa.")
-
-    # Histórico da conversa
-    db_history = db.query(Message)\
-        .filter(Message.conversation_id == conv_id)\
-        .order_by(Message.created_at.asc())\
-        .all()
-
-    formatted_history = [{"role": m.role, "content": m.content} for m in db_history]
+        new_title = content[:30] + "..." if len(content) > 30 else content
+        formatted_history = []
+    else:
+        # Histórico da conversa (só o final, dentro do orçamento de tokens)
+        formatted_history = await load_history_window(db, conv_id, reserve=estimate_tokens(content))
     formatted_history.append({"role": "user", "content": content})
 
+    # Tokens informados pelo provedor (preenchido pela chamada à IA)
+    usage = {}
+
+    # Resposta IA em streaming: salva o turno quando o stream terminar; o id
+    # de uma conversa nova chega no evento "done"
+    if message.stream:
+        async def on_finish(reply: str, completed: bool):
+            if reply and not usage and not completed:
+                usage.update(estimate_usage(formatted_history, reply))
+            saved_id = await save_streamed_turn(
+                conv_id, content, reply, user_id=current_user.id, usage=usage, title=new_title
+            )
+            return {"conversation_id": saved_id or conv_id}
+
+        llm_gate.check_capacity()
+        return ndjson_response(stream_reply(
+            stream_ai_response(
+                formatted_history,
+                user_data=user_profile(current_user),
+                language=message.language,
+                priority=PRIORITY_USER,
+                usage=usage
+            ),
+            on_finish=on_finish,
+            start={"conversation_id": conv_id} if conv_id else {}
+        ))
+
     # Resposta IA
-    ai_response = generate_ai_response(
+    ai_response = await generate_ai_response(
         formatted_history,
-        user_id=current_user.id,
-        user_name=current_user.full_name,
-        user_nickname=current_user.nickname,
-        user_interests=current_user.interests,
-        user_birth_date=current_user.birth_date,
-        language=message.language
+        user_data=user_profile(current_user),
+        language=message.language,
+        priority=PRIORITY_USER,
+        usage=usage
     )
 
-    # Salva mensagens
+    # Salva o turno (conversa nova + mensagens + consumo) em uma transação
     try:
-        user_msg = Message(conversation_id=conv_id, role="user", content=content)
-        ai_msg = Message(conversation_id=conv_id, role="assistant", content=ai_response)
-
-        db.add(user_msg)
-        db.add(ai_msg)
-
-        db.query(Conversation).filter(Conversation.id == conv_id).update({
-            "updated_at": datetime.utcnow()
-        })
-
-        db.commit()
-
+        conv_id = await save_turn(
+            conv_id, current_user.id, content, ai_response, usage, title=new_title, db=db
+        )
         return {
             "reply": ai_response,
             "conversation_id": conv_id
         }
 
     except Exception as e:
-        db.rollback()
         print(f"❌ Erro ao salvar mensagens: {e}")
         return {"reply": ai_response, "conversation_id": conv_id}
@@ -1,17 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from pydantic import BaseModel
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import delete, insert, literal, select
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import BaseModel, TypeAdapter
 from typing import List, Optional, Any
 from datetime import datetime
 
 # ✅ Importação dos modelos e esquemas
 from app.models.conversation import Conversation
-from app.models.message import Message
+from app.models.message import Message, estimate_tokens
 from app.schemas.message import ChatMessage
-from app.schemas.chat import ConversationResponse, MessageResponse
-from app.core.dependencies import get_current_user, get_db
-from app.core.prompts import get_system_prompt
-from app.services.ai_service import get_client
+from app.schemas.chat import ConversationResponse, MessageResponse, ConversationPage, ConversationDetail, SearchPage
+from app.core.pagination import encode_cursor, decode_cursor, keyset_filter, keyset_before_value, sortable_datetime
+from app.database.database import get_async_db, note_write
+from app.core.responses import json_response
+from app.routes.chat import chat_rate_limit
+from app.core.dependencies import get_current_user, get_current_user_read, get_db, get_read_db
+from app.core.prompts import get_system_prompt, user_profile
+from app.core.metrics import timed
+from app.services.ai_service import complete, stream_completion, AIUnavailableError
+from app.services.llm_gate import llm_gate, PRIORITY_USER
+from app.services.streaming import stream_reply, ndjson_response
+from app.services.chat_service import save_turn, save_streamed_turn
+from app.services.token_usage import enforce_token_quota, estimate_usage
+from app.services.context_window import load_history_window
+from app.services.history_cache import invalidate_history
+from app.services.search import search_messages
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/conversations", tags=["Conversations"])
 
@@ -24,31 +41,123 @@ class CreateConversationRequest(BaseModel):
 class UpdateConversationRequest(BaseModel):
     title: str
 
+# Serializadores das rotas com histórico completo (ver app/core/responses.py)
+_CONVERSATION_LIST = TypeAdapter(List[ConversationResponse])
+_CONVERSATION_DETAIL = TypeAdapter(ConversationDetail)
+
 # ============================
 # 1. LISTAR CONVERSAS
 # ============================
 @router.get("/", response_model=List[ConversationResponse])
 def list_conversations(
-    db: Session = Depends(get_db),
-    user=Depends(get_current_user)
+    db: Session = Depends(get_read_db),
+    user=Depends(get_current_user_read)
 ):
     # Retorna todas as conversas do usuário logado
-    return (
+    conversations = (
         db.query(Conversation)
+        .options(selectinload(Conversation.messages))  # 1 query para todas as mensagens, não 1 por conversa
         .filter(Conversation.user_id == user.id)
         .order_by(Conversation.updated_at.desc()) # Ordena pelas mais recentes
         .all()
     )
+    return json_response(_CONVERSATION_LIST, conversations)
+
+# ============================
+# 1.1 LISTAR CONVERSAS (RESUMO PAGINADO)
+# ============================
+# Declarada antes de /{conversation_id} para "summary" não cair no parâmetro.
+@router.get("/summary", response_model=ConversationPage)
+def list_conversation_summaries(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+    user=Depends(get_current_user_read)
+):
+    """
+    Lista só id/título/datas, sem tocar em `messages`, paginando por
+    (updated_at, id) decrescente. Passe `next_cursor` para a próxima página.
+    """
+    query = (
+        db.query(Conversation.id, Conversation.title, Conversation.created_at, Conversation.updated_at)
+        .filter(Conversation.user_id == user.id)
+    )
+
+    dialect = db.bind.dialect.name
+
+    if cursor:
+        # O cursor leva (updated_at, id) da última conversa da página:
+        # updated_at muda a cada mensagem e a conversa pode ser apagada,
+        # então o valor não é relido do banco
+        updated_at, conv_id = decode_cursor(cursor, datetime, int)
+        query = query.filter(keyset_before_value(
+            Conversation.updated_at, Conversation.id, updated_at, conv_id, dialect
+        ))
+
+    rows = (
+        query
+        .order_by(sortable_datetime(Conversation.updated_at, dialect).desc(), Conversation.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].updated_at, rows[-1].id)
+
+    return {"items": rows, "next_cursor": next_cursor}
+
+# ============================
+# 1.2 BUSCAR NO HISTÓRICO
+# ============================
+# Também declarada antes de /{conversation_id}.
+@router.get("/search", response_model=SearchPage)
+def search_conversations(
+    q: str = Query(..., min_length=2, max_length=200),
+    limit: int = Query(20, ge=1, le=50),
+    cursor: Optional[str] = None,
+    language: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+    user=Depends(get_current_user_read)
+):
+    """
+    Busca textual nas mensagens do usuário, das mais relevantes para as
+    menos, com trechos destacados. `language` ("pt-BR"/"en") escolhe o
+    dicionário; sem ele, vale português ou inglês.
+    """
+    offset = decode_cursor(cursor, int)[0] if cursor else 0
+
+    items = search_messages(db, user.id, q, limit + 1, offset, language)
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(offset + limit)
+
+    return {"items": items, "next_cursor": next_cursor}
 
 # ============================
 # 2. PEGAR CONVERSA ÚNICA (HISTÓRICO)
 # ============================
-@router.get("/{conversation_id}", response_model=ConversationResponse)
+@router.get("/{conversation_id}", response_model=ConversationDetail)
 def get_conversation(
     conversation_id: int,
-    db: Session = Depends(get_db),
-    user=Depends(get_current_user)
+    limit: int = Query(50, ge=1, le=200),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+    user=Depends(get_current_user_read)
 ):
+    """
+    Retorna a conversa com uma página de mensagens. Sem cursor, a página
+    mais recente; `before`/`after` navegam para mensagens mais antigas/novas.
+    A ordem é (created_at, id): mensagens salvas no mesmo commit têm o mesmo
+    created_at e o id desempata de forma estável.
+    """
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use apenas 'before' ou 'after'")
+
     conv = (
         db.query(Conversation)
         .filter(
@@ -61,9 +170,33 @@ def get_conversation(
     if not conv:
         raise HTTPException(status_code=404, detail="Conversa não encontrada")
 
-    # ✅ O segredo do histórico: O objeto 'conv' já deve carregar 
-    # a lista 'messages' se o relacionamento no Model estiver correto.
-    return conv
+    query = (
+        db.query(Message.id, Message.role, Message.content, Message.created_at)
+        .filter(Message.conversation_id == conv.id)
+    )
+
+    # Cursores = id da mensagem na borda da página (ver keyset_filter)
+    if after:
+        query = query.filter(keyset_filter(Message, Message.created_at, decode_cursor(after, int)[0], "after"))
+        rows = query.order_by(Message.created_at.asc(), Message.id.asc()).limit(limit + 1).all()
+        has_newer, has_older = len(rows) > limit, True
+        rows = rows[:limit]
+    else:
+        if before:
+            query = query.filter(keyset_filter(Message, Message.created_at, decode_cursor(before, int)[0]))
+        rows = query.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit + 1).all()
+        has_older, has_newer = len(rows) > limit, bool(before)
+        rows = rows[:limit][::-1]
+
+    return json_response(_CONVERSATION_DETAIL, {
+        "id": conv.id,
+        "title": conv.title,
+        "created_at": conv.created_at,
+        "updated_at": conv.updated_at,
+        "messages": rows,
+        "prev_cursor": encode_cursor(rows[0].id) if rows and has_older else None,
+        "next_cursor": encode_cursor(rows[-1].id) if rows and has_newer else None,
+    })
 
 # ============================
 # 3. CRIAR CONVERSA
@@ -81,6 +214,7 @@ def create_conversation(
     )
     db.add(conv)
     db.commit()
+    note_write(user.id)
     db.refresh(conv)
 
     return conv
@@ -88,75 +222,87 @@ def create_conversation(
 # ============================
 # 4. ENVIAR MENSAGEM (CHAT)
 # ============================
-@router.post("/{conversation_id}/messages")
-def send_message(
+@router.post(
+    "/{conversation_id}/messages",
+    dependencies=[Depends(chat_rate_limit), Depends(enforce_token_quota)]
+)
+async def send_message(
     conversation_id: int,
     payload: ChatMessage,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user=Depends(get_current_user)
 ):
-    conv = db.query(Conversation).filter(
+    conv = await db.scalar(select(Conversation).where(
         Conversation.id == conversation_id,
         Conversation.user_id == user.id
-    ).first()
+    ))
 
     if not conv:
         raise HTTPException(status_code=404, detail="Conversa não encontrada")
 
-    # 1. Salva mensagem do usuário (Usando 'content' ou 'text')
+    # 1. Mensagem do usuário (Usando 'content' ou 'text'); é salva junto
+    # com a resposta, no fim do turno
     content = payload.text if hasattr(payload, 'text') else payload.content
-    
-    user_msg = Message(
-        conversation_id=conv.id,
-        role="user",
-        content=content
-    )
-    db.add(user_msg)
-    
+    conv_id = conv.id
+
     # 2. Prepara dados para a IA (Prompt Personalizado)
-    user_data = {
-        "name": user.full_name,
-        "nickname": user.nickname,
-        "birth_date": user.birth_date,
-        "gender": user.gender,
-        "interests": user.interests,
-        "account_type": user.account_type
-    }
+    with timed("prompt_build"):
+        system_instruction = get_system_prompt(payload.language or "pt-BR", user_profile(user))
     
-    system_instruction = get_system_prompt(payload.language or "pt-BR", user_data)
-    
-    # Monta histórico para a API da OpenAI
-    messages_query = db.query(Message).filter(Message.conversation_id == conv.id).order_by(Message.created_at).all()
-    history = [{"role": "system", "content": system_instruction}]
-    for msg in messages_query:
-        history.append({"role": msg.role, "content": msg.content})
+    # Monta histórico para a API da OpenAI (final da conversa + pergunta atual)
+    window = await load_history_window(db, conv.id, reserve=estimate_tokens(content))
+    history = [
+        {"role": "system", "content": system_instruction},
+        *window,
+        {"role": "user", "content": content}
+    ]
+
+    # Tokens informados pelo provedor (preenchido pela chamada à IA)
+    usage = {}
+
+    # 3. Chama IA em streaming: o turno é salvo quando o stream terminar
+    if payload.stream:
+        user_id = user.id
+
+        async def on_finish(reply: str, completed: bool):
+            if reply and not usage and not completed:
+                usage.update(estimate_usage(history, reply))
+            await save_streamed_turn(conv_id, content, reply, user_id=user_id, usage=usage)
+            return {"conversation_id": conv_id}
+
+        llm_gate.check_capacity()
+        return ndjson_response(stream_reply(
+            stream_completion(history, priority=PRIORITY_USER, usage=usage),
+            on_finish=on_finish,
+            start={"conversation_id": conv_id}
+        ))
 
     # 3. Chama IA
     try:
-        client = get_client()
-        response = client.chat.completions.create(
-            model="gpt-5.2",
-            messages=history
-        )
-        reply = response.choices[0].message.content
+        reply = await complete(history, priority=PRIORITY_USER, usage=usage)
+
+        # 4. Salva o turno (mensagens + updated_at + consumo) em um commit
+        await save_turn(conv_id, user.id, content, reply, usage, db=db)
+        return {"conversation_id": conv_id, "reply": reply}
 
-        # 4. Salva resposta da IA
-        ai_msg = Message(
-            conversation_id=conv.id,
-            role="assistant",
-            content=reply
+    except HTTPException:
+        await db.rollback()
+        raise
+
+    except AIUnavailableError as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=503,
+            detail="IA indisponível no momento. Tente novamente em instantes.",
+            headers={"Retry-After": str(e.retry_after)}
         )
-        db.add(ai_msg)
-        
-        # Atualiza o timestamp da conversa
-        conv.updated_at = datetime.utcnow()
-        
-        db.commit()
-        return {"conversation_id": conv.id, "reply": reply}
 
     except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=f"Erro na IA: {str(e)}")
+        await db.rollback()
+        invalidate_history(conversation_id)
+        # Detalhes (SQL, parâmetros) só no log, nunca na resposta
+        logger.error(f"Erro ao processar mensagem da conversa {conversation_id}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Erro ao processar a mensagem")
 
 # ============================
 # 5. DUPLICAR CONVERSA
@@ -167,25 +313,39 @@ def duplicate_conversation(
     db: Session = Depends(get_db),
     user=Depends(get_current_user)
 ):
-    original_conv = db.query(Conversation).filter(
+    """
+    Copia a conversa numa única transação: as mensagens são copiadas com um
+    INSERT ... SELECT no próprio banco, sem passar pela aplicação.
+    """
+    original = db.execute(select(Conversation.id, Conversation.title).where(
         Conversation.id == conversation_id,
         Conversation.user_id == user.id
-    ).first()
+    )).first()
 
-    if not original_conv:
+    if not original:
         raise HTTPException(status_code=404, detail="Conversa não encontrada")
 
-    new_conv = Conversation(user_id=user.id, title=f"Cópia - {original_conv.title}")
+    new_conv = Conversation(user_id=user.id, title=f"Cópia - {original.title}")
     db.add(new_conv)
-    db.commit()
-    db.refresh(new_conv)
+    db.flush()  # gera o id sem commit
+
+    # created_at original preserva a ordem (created_at, id) da conversa
+    db.execute(
+        insert(Message).from_select(
+            ["conversation_id", "role", "content", "token_count", "created_at"],
+            select(
+                literal(new_conv.id), Message.role, Message.content,
+                Message.token_count, Message.created_at
+            )
+            .where(Message.conversation_id == conversation_id)
+            .order_by(Message.created_at, Message.id)
+        )
+    )
 
-    original_messages = db.query(Message).filter(Message.conversation_id == original_conv.id).all()
-    for msg in original_messages:
-        db.add(Message(conversation_id=new_conv.id, role=msg.role, content=msg.content))
-    
     db.commit()
-    db.refresh(new_conv)
+    note_write(user.id)
+    # IDs podem ser reaproveitados (SQLite): descarta qualquer entrada antiga
+    invalidate_history(new_conv.id)
     return new_conv
 
 # ============================
@@ -197,13 +357,19 @@ def update_conversation(conversation_id: int, request: UpdateConversationRequest
     if not conv: raise HTTPException(status_code=404, detail="Não encontrada")
     conv.title = request.title
     db.commit()
+    note_write(user.id)
     return conv
 
 @router.delete("/{conversation_id}")
 def delete_conversation(conversation_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
-    conv = db.query(Conversation).filter(Conversation.id == conversation_id, Conversation.user_id == user.id).first()
-    if not conv: raise HTTPException(status_code=404, detail="Não encontrada")
-    db.query(Message).filter(Message.conversation_id == conv.id).delete()
-    db.delete(conv)
+    # Um DELETE; as mensagens saem pelo ON DELETE CASCADE do banco
+    result = db.execute(
+        delete(Conversation).where(Conversation.id == conversation_id, Conversation.user_id == user.id)
+    )
+    if not result.rowcount:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Não encontrada")
     db.commit()
+    note_write(user.id)
+    invalidate_history(conversation_id)
     return {"message": "Deletado"}
\ No newline at end of file
@@ -1,5 +1,12 @@
 from pydantic import BaseModel
-from typing import List, Optional, Any
+from typing import List, Literal, Optional, Any
+
+
+class HistoryMessage(BaseModel):
+    """Mensagem do histórico enviado pelo cliente (modo convidado)"""
+    role: Literal["user", "assistant"]
+    content: str
+
 
 class MessageCreate(BaseModel):
     # ✅ CORREÇÃO: Tornamos content opcional e adicionamos text
@@ -23,7 +30,10 @@ class MessageCreate(BaseModel):
     user_birth_date: Optional[Any] = None
 
     # Histórico temporário (para modo convidado)
-    history: Optional[List[dict]] = None 
+    history: Optional[List[HistoryMessage]] = None
+
+    # Resposta em streaming (NDJSON token a token)
+    stream: Optional[bool] = False
 
 # --- Restante dos Schemas permanece igual ---
 class MessageResponse(BaseModel):
@@ -43,4 +53,41 @@ class ConversationResponse(BaseModel):
     messages: List[MessageResponse] = []
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class ConversationSummary(BaseModel):
+    """Item da barra lateral (sem mensagens)"""
+    id: int
+    title: Optional[str] = None
+    created_at: Any
+    updated_at: Any
+
+    class Config:
+        from_attributes = True
+
+
+class ConversationPage(BaseModel):
+    items: List[ConversationSummary]
+    next_cursor: Optional[str] = None
+
+
+class ConversationDetail(ConversationResponse):
+    """Conversa com uma página de mensagens (ordem cronológica)"""
+    # Passe em `before` para carregar mensagens mais antigas
+    prev_cursor: Optional[str] = None
+    # Passe em `after` para carregar mensagens mais novas
+    next_cursor: Optional[str] = None
+
+class SearchHit(BaseModel):
+    """Mensagem encontrada pela busca; `snippet` é HTML escapado com <mark>"""
+    message_id: int
+    conversation_id: int
+    title: Optional[str] = None
+    role: str
+    created_at: Any
+    score: float
+    snippet: str
+
+class SearchPage(BaseModel):
+    items: List[SearchHit]
+    next_cursor: Optional[str] = None
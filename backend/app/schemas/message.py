@@ -4,3 +4,4 @@ from typing import Optional
 class ChatMessage(BaseModel):
     text: str
     language: Optional[str] = None
+    stream: Optional[bool] = False
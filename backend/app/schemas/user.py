@@ -1,8 +1,10 @@
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, computed_field, field_validator
 from typing import Optional, List
 from datetime import date
 import json
 
+from app.services.media import thumbnail_urls
+
 
 # =========================
 # INPUTS
@@ -56,6 +58,12 @@ class UserResponse(BaseModel):
                 return []
         return v or []
 
+    @computed_field
+    @property
+    def profile_thumbnails(self) -> Optional[dict]:
+        """Miniaturas WebP por lado em px ({"64": url, ...}); None para fotos antigas"""
+        return thumbnail_urls(self.profile_image)
+
     class Config:
         from_attributes = True
 
@@ -63,3 +71,20 @@ class UserResponse(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+
+
+class DailyUsage(BaseModel):
+    day: date
+    prompt_tokens: int
+    completion_tokens: int
+    requests: int
+
+    class Config:
+        from_attributes = True
+
+
+class UsageResponse(BaseModel):
+    used_today: int
+    quota: Optional[int] = None  # None = sem limite para o tipo de conta
+    remaining: Optional[int] = None
+    days: List[DailyUsage]
@@ -1,7 +1,24 @@
-from openai import OpenAI
+import asyncio
+import random
+from functools import lru_cache
+from fastapi import HTTPException
 from app.core.prompts import get_system_prompt
-from app.core.config import AI_MODEL
-from datetime import date
+from app.core.config import (
+    AI_MODEL,
+    AI_FALLBACK_MODEL,
+    LLM_TIMEOUT,
+    LLM_CONNECT_TIMEOUT,
+    LLM_MAX_RETRIES,
+    LLM_RETRY_BASE_DELAY,
+    LLM_RETRY_MAX_DELAY,
+    AI_WARMUP_CONNECT,
+)
+from app.services.llm_gate import llm_gate, PRIORITY_GUEST
+from app.services.circuit_breaker import get_breaker
+from app.core.metrics import timed, observe_stage, record_usage
+from app.services.token_usage import fill_usage
+from time import perf_counter
+from typing import AsyncIterator
 import logging
 import os
 
@@ -10,9 +27,40 @@ logger = logging.getLogger(__name__)
 # Cliente global
 client = None
 
+# Resposta padrão quando a chamada à IA falha
+FALLBACK_REPLY = "Desculpe, ocorreu um erro ao processar sua mensagem."
+
+
+@lru_cache(maxsize=None)
+def retryable_errors() -> tuple:
+    """
+    Falhas transitórias: vale tentar de novo (com backoff) ou ir para o reserva.
+    Erros 4xx (prompt inválido, chave errada...) não entram aqui.
+    O SDK da OpenAI (e o httpx) é importado só aqui e em get_client(): são os
+    imports mais pesados da API e ficam fora do `import app.main` (o lifespan
+    faz esse import em paralelo com o aquecimento do banco).
+    """
+    from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+    return (
+        APITimeoutError,
+        APIConnectionError,
+        RateLimitError,
+        InternalServerError,
+        asyncio.TimeoutError,
+    )
+
+
+class AIUnavailableError(Exception):
+    """Modelo principal e reserva indisponíveis (retries esgotados ou circuito aberto)"""
+
+    def __init__(self, retry_after: int = 1):
+        super().__init__("IA indisponível no momento")
+        self.retry_after = retry_after
+
 
 def get_client():
-    """Obtém ou cria cliente OpenAI com validação de chave"""
+    """Obtém ou cria cliente OpenAI (assíncrono) com validação de chave"""
     global client
     
     if client is not None:
@@ -24,63 +72,232 @@ def get_client():
         logger.error("OPENAI_API_KEY não configurada")
         raise ValueError("OPENAI_API_KEY não configurada")
 
-    client = OpenAI(api_key=api_key)
+    import httpx
+    from openai import AsyncOpenAI
+
+    # Sem retries internos do SDK: a política fica em _attempts()
+    client = AsyncOpenAI(
+        api_key=api_key,
+        timeout=httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+        max_retries=0
+    )
     logger.info("Cliente OpenAI inicializado com sucesso")
     return client
 
 
-def generate_ai_response(
+async def warm_up() -> bool:
+    """
+    Chamado no lifespan, antes de aceitar tráfego: importa o SDK e cria o
+    cliente numa thread e, com AI_WARMUP_CONNECT, já abre a conexão TLS com
+    a API (consultando o modelo) para o primeiro chat não pagar o handshake.
+    """
+    try:
+        ai = await asyncio.to_thread(lambda: (retryable_errors(), get_client())[1])
+    except ValueError:
+        return False  # sem chave: get_client() já registrou
+
+    if AI_WARMUP_CONNECT:
+        try:
+            await asyncio.wait_for(ai.models.retrieve(AI_MODEL), timeout=LLM_CONNECT_TIMEOUT * 2)
+        except Exception as e:
+            # Só aquecimento: a API sobe mesmo assim
+            logger.warning(f"Aquecimento da conexão com a IA falhou: {e!r}")
+    return True
+
+
+# ============================
+# TENTATIVAS: RETRY + CIRCUIT BREAKER + RESERVA
+# ============================
+def _backoff(attempt: int) -> float:
+    """Exponencial com jitter total: espalha os retries de vários clientes"""
+    return random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2 ** attempt))
+
+
+def _candidate_models(model: str) -> list:
+    if AI_FALLBACK_MODEL and AI_FALLBACK_MODEL != model:
+        return [model, AI_FALLBACK_MODEL]
+    return [model]
+
+
+async def _attempts(model: str):
+    """
+    Gera (modelo, breaker) para cada tentativa permitida: até
+    LLM_MAX_RETRIES retries no modelo pedido e depois no reserva, pulando
+    modelos com o circuito aberto. O chamador registra sucesso/falha no
+    breaker. Esgotou -> AIUnavailableError.
+    """
+    retry_after = 1
+
+    for name in _candidate_models(model):
+        breaker = get_breaker(name)
+
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            if not breaker.allow():
+                logger.warning(f"Circuito aberto para {name}: chamada não enviada")
+                break
+
+            if attempt:
+                await asyncio.sleep(_backoff(attempt - 1))
+
+            yield name, breaker
+
+        retry_after = breaker.retry_after()
+
+    raise AIUnavailableError(retry_after)
+
+
+async def complete(
     messages: list,
-    user_id: int = None,
-    user_email: str = None,
-    user_name: str = None,
-    user_nickname: str = None,
-    user_account_type: str = None,
-    user_interests: str = None,
-    user_gender: str = None,
-    user_birth_date: date = None,
-    language: str | None = None
+    model: str = AI_MODEL,
+    priority: int = PRIORITY_GUEST,
+    usage: dict | None = None
+) -> str:
+    """
+    Uma resposta completa, com prazo por tentativa, retries e modelo reserva.
+    Se `usage` for passado, recebe model/prompt_tokens/completion_tokens.
+    """
+    client = get_client()
+    attempts = _attempts(model)
+
+    try:
+        async for name, breaker in attempts:
+            try:
+                async with llm_gate.slot(priority):
+                    with timed("llm"):
+                        response = await asyncio.wait_for(
+                            client.chat.completions.create(model=name, messages=messages),
+                            timeout=LLM_TIMEOUT
+                        )
+            except retryable_errors() as e:
+                breaker.record_failure()
+                logger.warning(f"Falha transitória em {name}: {e!r}")
+                continue
+
+            breaker.record_success()
+            record_usage(name, getattr(response, "usage", None))
+            fill_usage(usage, name, getattr(response, "usage", None))
+            return response.choices[0].message.content
+    finally:
+        await attempts.aclose()
+
+
+async def generate_ai_response(
+    messages: list,
+    user_data: dict | None = None,
+    language: str | None = None,
+    priority: int = PRIORITY_GUEST,
+    usage: dict | None = None
 ):
-    """Gera resposta da IA usando OpenAI e contexto do usuário"""
+    """Gera resposta da IA usando OpenAI e contexto do usuário (ver prompts.user_profile)"""
 
     try:
-        system_prompt = get_system_prompt(language)
-
-        # Adiciona contexto do usuário
-        if any([user_name, user_email, user_interests, user_gender,
-                user_birth_date, user_account_type, user_nickname]):
-
-            system_prompt += "\n\n=== INFORMAÇÕES DO USUÁRIO ===\n"
-
-            if user_name:
-                system_prompt += f"Nome: {user_name}\n"
-            if user_nickname:
-                system_prompt += f"Apelido: {user_nickname}\n"
-            if user_email:
-                system_prompt += f"Email: {user_email}\n"
-            if user_gender:
-                system_prompt += f"Gênero: {user_gender}\n"
-            if user_birth_date:
-                system_prompt += f"Data de Nascimento: {user_birth_date}\n"
-            if user_account_type:
-                system_prompt += f"Tipo de Conta: {user_account_type}\n"
-            if user_interests:
-                system_prompt += f"Áreas de Interesse: {user_interests}\n"
-
-            system_prompt += "\nUse essas informações para personalizar as respostas."
-
-        client = get_client()
-
-        response = client.chat.completions.create(
-            model=AI_MODEL,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                *messages
-            ]
-        )
-
-        return response.choices[0].message.content
+        with timed("prompt_build"):
+            system_prompt = get_system_prompt(language, user_data)
+
+        return await complete([
+            {"role": "system", "content": system_prompt},
+            *messages
+        ], priority=priority, usage=usage)
+
+    except HTTPException:
+        # Sobrecarga (503 do controle de admissão) vai direto para o cliente
+        raise
+
+    except AIUnavailableError:
+        logger.error("IA indisponível: retries esgotados ou circuito aberto")
+        return FALLBACK_REPLY
 
     except Exception as e:
         logger.error(f"Erro ao chamar IA: {str(e)}", exc_info=True)
-        return "Desculpe, ocorreu um erro ao processar sua mensagem."
+        return FALLBACK_REPLY
+
+
+async def stream_completion(
+    messages: list,
+    model: str = AI_MODEL,
+    priority: int = PRIORITY_GUEST,
+    usage: dict | None = None
+) -> AsyncIterator[str]:
+    """
+    Repassa os tokens da OpenAI à medida que chegam (stream=True).
+    Retries e modelo reserva só antes do primeiro token; depois disso a
+    falha é propagada (o cliente já recebeu parte da resposta).
+    """
+    client = get_client()
+    attempts = _attempts(model)
+
+    try:
+        async for name, breaker in attempts:
+            started = False
+            try:
+                # A vaga fica ocupada durante todo o stream
+                async with llm_gate.slot(priority):
+                    sent_at = perf_counter()
+                    stream = await asyncio.wait_for(
+                        client.chat.completions.create(
+                            model=name,
+                            messages=messages,
+                            stream=True,
+                            # Último chunk traz `usage` (sem choices)
+                            stream_options={"include_usage": True}
+                        ),
+                        timeout=LLM_TIMEOUT
+                    )
+                    async with stream:
+                        async for chunk in stream:
+                            if getattr(chunk, "usage", None):
+                                record_usage(name, chunk.usage)
+                                fill_usage(usage, name, chunk.usage)
+                            if not chunk.choices:
+                                continue
+                            delta = chunk.choices[0].delta.content
+                            if delta:
+                                if not started:
+                                    observe_stage("llm_ttft", perf_counter() - sent_at)
+                                started = True
+                                yield delta
+                    observe_stage("llm", perf_counter() - sent_at)
+            except retryable_errors() as e:
+                breaker.record_failure()
+                if started:
+                    raise
+                logger.warning(f"Falha transitória em {name} (stream): {e!r}")
+                continue
+
+            breaker.record_success()
+            return
+    finally:
+        await attempts.aclose()
+
+
+async def stream_ai_response(
+    messages: list,
+    user_data: dict | None = None,
+    language: str | None = None,
+    priority: int = PRIORITY_GUEST,
+    usage: dict | None = None
+) -> AsyncIterator[str]:
+    """Versão em streaming de generate_ai_response (mesmo prompt, mesmo fallback)"""
+    started = False
+
+    try:
+        with timed("prompt_build"):
+            system_prompt = get_system_prompt(language, user_data)
+
+        async for token in stream_completion([
+            {"role": "system", "content": system_prompt},
+            *messages
+        ], priority=priority, usage=usage):
+            started = True
+            yield token
+
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        logger.error(f"Erro ao chamar IA (stream): {str(e)}", exc_info=True)
+        # Só devolve o pedido de desculpas se nada foi enviado ainda; no meio
+        # do stream, propaga para o cliente receber um evento "error"
+        if started:
+            raise
+        yield FALLBACK_REPLY
@@ -0,0 +1,61 @@
+import hashlib
+import json
+import re
+from typing import Optional
+
+from app.core.cache import TTLCache
+from app.core.config import (
+    AI_MODEL,
+    GUEST_CACHE_ENABLED,
+    GUEST_CACHE_SIZE,
+    GUEST_CACHE_MAX_BYTES,
+    GUEST_CACHE_TTL,
+)
+
+# ============================
+# CACHE DE RESPOSTAS (MODO VISITANTE)
+# ============================
+# Visitantes não têm perfil nem conversa salva: a mesma pergunta, no mesmo
+# idioma e com o mesmo histórico, gera o mesmo prompt. Só respostas bem
+# sucedidas entram; o tamanho total é limitado em bytes.
+
+answer_cache = TTLCache(
+    maxsize=GUEST_CACHE_SIZE,
+    ttl=GUEST_CACHE_TTL,
+    maxbytes=GUEST_CACHE_MAX_BYTES,
+    sizeof=lambda reply: len(reply.encode("utf-8"))
+)
+
+_SPACES = re.compile(r"\s+")
+
+
+def _normalize(text: str) -> str:
+    """Ignora maiúsculas, espaços repetidos e pontuação final ("Oi!" == "oi")"""
+    return _SPACES.sub(" ", text.strip().lower()).rstrip("?!.… ")
+
+
+def guest_cache_key(language: Optional[str], history: list, question: str, model: str = AI_MODEL) -> str:
+    """
+    `history` é o histórico já validado (MessageCreate.history, role e
+    content como str) e cortado por trim_to_budget, nunca os dicts crus do
+    cliente.
+    """
+    lang = "en" if language and language.lower().startswith("en") else "pt"
+    payload = [
+        lang,
+        model,
+        [(m["role"], _normalize(m["content"])) for m in history],
+        _normalize(question),
+    ]
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def get_cached_answer(key: str) -> Optional[str]:
+    if not GUEST_CACHE_ENABLED:
+        return None
+    return answer_cache.get(key)
+
+
+def cache_answer(key: str, reply: str):
+    if GUEST_CACHE_ENABLED and reply:
+        answer_cache.set(key, reply)
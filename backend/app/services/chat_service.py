@@ -1,8 +1,27 @@
+import logging
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import update
 from sqlalchemy.orm import Session
-from app.models import Conversation, Message, User
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import PERSIST_MODE
+from app.database.database import AsyncSessionLocal, note_write
+from app.core.metrics import timed
+from app.services.token_usage import add_usage
+from app.services.history_cache import set_history, append_history, invalidate_history
+from app.services.write_behind import Turn, turn_writer
+from app.services.summarizer import summaries
+from app.models.conversation import Conversation
+from app.models.message import Message
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
 
 
 def get_or_create_conversation(db: Session, user: User):
+    """Não faz commit: a conversa nova entra na transação do chamador"""
     conversation = (
         db.query(Conversation)
         .filter(Conversation.user_id == user.id)
@@ -13,19 +32,148 @@ def get_or_create_conversation(db: Session, user: User):
     if not conversation:
         conversation = Conversation(user_id=user.id)
         db.add(conversation)
-        db.commit()
-        db.refresh(conversation)
+        db.flush()  # gera o id sem commit
 
     return conversation
 
 
 def save_message(db: Session, conversation_id: int, role: str, content: str):
+    """Não faz commit: o chamador grava o turno inteiro de uma vez"""
     message = Message(
         conversation_id=conversation_id,
         role=role,
         content=content
     )
     db.add(message)
-    db.commit()
-    db.refresh(message)
     return message
+
+
+# ============================
+# GRAVAÇÃO DE UM TURNO (PERGUNTA + RESPOSTA)
+# ============================
+def _turn_messages(user_content: str, reply: str, usage: dict) -> list:
+    # Mesmas chaves em todas as linhas (INSERT de várias linhas no write-behind)
+    rows = [{"role": "user", "content": user_content, "prompt_tokens": None, "completion_tokens": None}]
+    if reply:
+        rows.append({
+            "role": "assistant",
+            "content": reply,
+            "prompt_tokens": usage.get("prompt_tokens"),
+            "completion_tokens": usage.get("completion_tokens"),
+        })
+    return rows
+
+
+async def persist_turn(
+    db: AsyncSession,
+    conversation_id: Optional[int],
+    user_id: int,
+    user_content: str,
+    reply: str,
+    usage: Optional[dict] = None,
+    title: Optional[str] = None
+) -> int:
+    """
+    Grava o turno numa única transação (um commit): cria a conversa se
+    `conversation_id` for None, insere as mensagens, atualiza updated_at e
+    soma o consumo de tokens. Devolve o id da conversa.
+    """
+    usage = usage or {}
+    messages = [Message(**row) for row in _turn_messages(user_content, reply, usage)]
+    now = datetime.utcnow()
+
+    try:
+        if conversation_id is None:
+            # O unit of work insere a conversa e depois as mensagens
+            conv = Conversation(user_id=user_id, title=title, created_at=now, updated_at=now)
+            conv.messages = messages
+            db.add(conv)
+        else:
+            for message in messages:
+                message.conversation_id = conversation_id
+                db.add(message)
+            await db.execute(
+                update(Conversation)
+                .where(Conversation.id == conversation_id)
+                .values(updated_at=now)
+            )
+
+        await add_usage(db, user_id, usage)
+
+        with timed("db_commit"):
+            await db.commit()
+    except Exception:
+        await db.rollback()
+        if conversation_id is not None:
+            invalidate_history(conversation_id)
+        raise
+
+    # Com o id: o cache sabe quais mensagens o resumo já cobre
+    history = [{"id": m.id, "role": m.role, "content": m.content} for m in messages]
+    if conversation_id is None:
+        conversation_id = conv.id
+        set_history(conversation_id, [])  # conversa nova: cache começa vazio
+    append_history(conversation_id, *history)
+
+    return conversation_id
+
+
+async def save_turn(
+    conversation_id: Optional[int],
+    user_id: int,
+    user_content: str,
+    reply: str,
+    usage: Optional[dict] = None,
+    title: Optional[str] = None,
+    db: Optional[AsyncSession] = None
+) -> int:
+    """
+    Grava o turno conforme PERSIST_MODE. No modo "batched", turnos de
+    conversas existentes vão para o write-behind; conversas novas precisam
+    do id na resposta e são sempre gravadas direto.
+    """
+    # Antes de gravar: as próximas leituras do usuário já vão ao primário
+    note_write(user_id)
+
+    if conversation_id is not None and PERSIST_MODE == "batched":
+        usage = usage or {}
+        with timed("db_commit"):
+            await turn_writer.submit(Turn(
+                conversation_id=conversation_id,
+                user_id=user_id,
+                messages=_turn_messages(user_content, reply, usage),
+                usage=usage,
+            ))
+    elif db is not None:
+        conversation_id = await persist_turn(db, conversation_id, user_id, user_content, reply, usage, title)
+    else:
+        async with AsyncSessionLocal() as session:
+            conversation_id = await persist_turn(
+                session, conversation_id, user_id, user_content, reply, usage, title
+            )
+
+    # Resumo das mensagens antigas: em segundo plano, fora do request
+    summaries.schedule(conversation_id, user_id)
+    return conversation_id
+
+
+async def save_streamed_turn(
+    conversation_id: Optional[int],
+    user_content: str,
+    reply: str,
+    user_id: int,
+    usage: Optional[dict] = None,
+    title: Optional[str] = None
+) -> Optional[int]:
+    """
+    Persiste um turno (pergunta + resposta) ao final de um stream.
+    Usa uma sessão própria porque a do request pode já ter sido fechada
+    quando o stream termina. Se o cliente desconectou no meio, salva a
+    resposta parcial (quando houver). Devolve o id da conversa (None se
+    a gravação falhou).
+    """
+    try:
+        return await save_turn(conversation_id, user_id, user_content, reply, usage, title)
+    except Exception as e:
+        logger.error(f"Erro ao salvar mensagens (stream): {e}", exc_info=True)
+        return None
@@ -0,0 +1,98 @@
+import math
+from time import monotonic
+
+from app.core.config import LLM_BREAKER_THRESHOLD, LLM_BREAKER_COOLDOWN
+from app.core.metrics import gauge, register_collector
+
+# ============================
+# CIRCUIT BREAKER (POR MODELO)
+# ============================
+# closed:    chamadas passam; LLM_BREAKER_THRESHOLD falhas seguidas -> open
+# open:      chamadas falham na hora, sem esperar timeout do provedor
+# half_open: passado o cooldown, uma chamada de teste decide se fecha ou reabre
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, threshold: int, cooldown: float):
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_at = 0.0
+
+        # Métricas
+        self.trips = 0
+        self.short_circuited = 0
+
+    def allow(self) -> bool:
+        now = monotonic()
+
+        if self.state == "closed":
+            return True
+
+        if self.state == "open" and now - self._opened_at >= self.cooldown:
+            self.state = "half_open"
+            self._probe_at = now
+            return True
+
+        # Teste abandonado (ex.: cliente desconectou): libera um novo
+        if self.state == "half_open" and now - self._probe_at >= self.cooldown:
+            self._probe_at = now
+            return True
+
+        self.short_circuited += 1
+        return False
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.threshold:
+            if self.state != "open":
+                self.trips += 1
+            self.state = "open"
+            self._opened_at = monotonic()
+
+    def retry_after(self) -> int:
+        """Segundos até o próximo teste (para o header Retry-After)"""
+        if self.state == "closed":
+            return 1
+        return max(1, math.ceil(self.cooldown - (monotonic() - self._opened_at)))
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "trips": self.trips,
+            "short_circuited": self.short_circuited,
+        }
+
+
+_breakers: dict = {}
+
+
+def get_breaker(model: str) -> CircuitBreaker:
+    breaker = _breakers.get(model)
+    if breaker is None:
+        breaker = _breakers[model] = CircuitBreaker(model, LLM_BREAKER_THRESHOLD, LLM_BREAKER_COOLDOWN)
+    return breaker
+
+
+def breaker_stats() -> dict:
+    return {name: breaker.stats() for name, breaker in _breakers.items()}
+
+
+BREAKER_OPEN = gauge("atena_llm_breaker_open", "1 se o circuito do modelo não está fechado", ("model",))
+BREAKER_TRIPS = gauge("atena_llm_breaker_trips", "Vezes que o circuito abriu", ("model",))
+
+
+@register_collector
+def _collect_breaker_stats():
+    for name, breaker in list(_breakers.items()):
+        BREAKER_OPEN.set(int(breaker.state != "closed"), model=name)
+        BREAKER_TRIPS.set(breaker.trips, model=name)
@@ -0,0 +1,101 @@
+from typing import Iterable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import (
+    AI_MODEL,
+    MAX_MESSAGE_HISTORY,
+    HISTORY_TOKEN_BUDGET,
+    MODEL_TOKEN_BUDGETS,
+)
+from app.core.metrics import timed
+from app.models.conversation import Conversation
+from app.models.message import Message, estimate_tokens
+from app.services.history_cache import get_history, set_history, get_summary, set_summary
+
+# ============================
+# JANELA DE CONTEXTO (HISTÓRICO)
+# ============================
+# Só o final da conversa vai para a IA: busca as últimas
+# MAX_MESSAGE_HISTORY linhas (role, content, token_count) com LIMIT — ou do
+# cache write-through — e corta as mais antigas até caber no orçamento de
+# tokens do modelo. Em conversas longas, o resumo acumulado das mensagens
+# antigas (app/services/summarizer.py) vai antes, como mensagem de sistema,
+# e o final só tem as mensagens depois dele (id > summary_until_id).
+
+SUMMARY_HEADER = "Resumo da conversa até aqui (mensagens anteriores):"
+
+
+def get_token_budget(model: Optional[str] = None) -> int:
+    """Orçamento de tokens do histórico para o modelo (ou o padrão)"""
+    return MODEL_TOKEN_BUDGETS.get(model or AI_MODEL, HISTORY_TOKEN_BUDGET)
+
+
+def trim_to_budget(messages: Iterable[dict], budget: int, counted: bool = False) -> list:
+    """
+    Mantém as mensagens mais recentes que cabem no orçamento.
+    Recebe em ordem cronológica. Com `counted=True` (só linhas do banco ou
+    do cache) usa o "tokens" já calculado; histórico vindo do cliente é
+    sempre estimado aqui.
+    """
+    window = []
+    used = 0
+
+    for msg in reversed(list(messages)):
+        tokens = (counted and msg.get("tokens")) or estimate_tokens(msg["content"])
+        if used + tokens > budget:
+            break
+        used += tokens
+        window.append({"role": msg["role"], "content": msg["content"]})
+
+    window.reverse()
+    return window
+
+
+async def load_history_window(
+    db: AsyncSession,
+    conversation_id: int,
+    model: Optional[str] = None,
+    reserve: int = 0
+) -> list:
+    """
+    Carrega o final do histórico da conversa já cortado pelo orçamento,
+    precedido do resumo das mensagens antigas quando houver.
+    `reserve` desconta os tokens que serão adicionados depois (ex.: a
+    pergunta atual).
+    """
+    with timed("history_load"):
+        # Resumo primeiro: o final do histórico começa logo depois dele
+        cached = get_summary(conversation_id)
+        if cached is None:
+            row = (await db.execute(
+                select(Conversation.summary, Conversation.summary_until_id)
+                .where(Conversation.id == conversation_id)
+            )).first()
+            cached = (row.summary, row.summary_until_id) if row else (None, None)
+            set_summary(conversation_id, *cached)
+        summary, until = cached
+
+        tail = get_history(conversation_id)
+
+        if tail is None:
+            rows = await db.execute(
+                select(Message.id, Message.role, Message.content, Message.token_count)
+                .where(Message.conversation_id == conversation_id, Message.id > (until or 0))
+                .order_by(Message.created_at.desc(), Message.id.desc())
+                .limit(MAX_MESSAGE_HISTORY)
+            )
+
+            tail = [
+                {"id": r.id, "role": r.role, "content": r.content, "tokens": r.token_count}
+                for r in reversed(rows.all())
+            ]
+            set_history(conversation_id, tail)
+
+    budget = get_token_budget(model) - reserve
+    if not summary:
+        return trim_to_budget(tail, budget, counted=True)
+
+    note = {"role": "system", "content": f"{SUMMARY_HEADER}\n{summary}"}
+    return [note] + trim_to_budget(tail, budget - estimate_tokens(note["content"]), counted=True)
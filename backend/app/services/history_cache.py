@@ -0,0 +1,70 @@
+from typing import Optional
+
+from app.core.cache import TTLCache
+from app.core.config import HISTORY_CACHE_SIZE, HISTORY_CACHE_TTL, MAX_MESSAGE_HISTORY
+from app.models.message import estimate_tokens
+
+# ============================
+# CACHE DO HISTÓRICO (WRITE-THROUGH)
+# ============================
+# conversation_id -> últimas MAX_MESSAGE_HISTORY mensagens ainda fora do
+# resumo, no mesmo formato que a janela de contexto lê do banco
+# ({"id", "role", "content", "tokens"}; "id" é None até o INSERT).
+# As rotas de chat atualizam a entrada logo após o commit; exclusões e
+# duplicações invalidam. O TTL limita a defasagem entre workers.
+
+history_cache = TTLCache(maxsize=HISTORY_CACHE_SIZE, ttl=HISTORY_CACHE_TTL)
+
+# conversation_id -> (resumo acumulado, summary_until_id); ("", 0) = conversa
+# ainda sem resumo. Atualizado pelo worker de resumos deste processo; nos
+# demais, vale o TTL.
+summary_cache = TTLCache(maxsize=HISTORY_CACHE_SIZE, ttl=HISTORY_CACHE_TTL)
+
+
+def get_history(conversation_id: int) -> Optional[list]:
+    return history_cache.get(conversation_id)
+
+
+def set_history(conversation_id: int, tail: list):
+    history_cache.set(conversation_id, tail[-MAX_MESSAGE_HISTORY:])
+
+
+def append_history(conversation_id: int, *messages: dict) -> list:
+    """
+    Acrescenta mensagens ao final (só se a conversa estiver em cache).
+    Devolve as linhas criadas, para o write-behind preencher o "id" depois
+    do INSERT.
+    """
+    tail = history_cache.peek(conversation_id)
+    if tail is None:
+        return []
+
+    new_rows = [
+        {"id": m.get("id"), "role": m["role"], "content": m["content"], "tokens": estimate_tokens(m["content"])}
+        for m in messages
+    ]
+    set_history(conversation_id, tail + new_rows)
+    return new_rows
+
+
+def get_summary(conversation_id: int) -> Optional[tuple]:
+    """(resumo, summary_until_id) ou None se não estiver em cache"""
+    return summary_cache.get(conversation_id)
+
+
+def set_summary(conversation_id: int, summary: Optional[str], until_id: Optional[int]):
+    """
+    Guarda o resumo e tira do histórico em cache as mensagens que ele já
+    cobre (id <= until_id): a janela não manda a mesma mensagem duas vezes.
+    """
+    until_id = until_id or 0
+    summary_cache.set(conversation_id, (summary or "", until_id))
+
+    tail = history_cache.peek(conversation_id)
+    if tail is not None and any(m["id"] is not None and m["id"] <= until_id for m in tail):
+        set_history(conversation_id, [m for m in tail if m["id"] is None or m["id"] > until_id])
+
+
+def invalidate_history(*conversation_ids: int):
+    history_cache.invalidate(*conversation_ids)
+    summary_cache.invalidate(*conversation_ids)
@@ -0,0 +1,147 @@
+import asyncio
+import heapq
+import itertools
+import math
+from contextlib import asynccontextmanager
+from time import monotonic
+
+from fastapi import HTTPException
+
+from app.core.config import LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE, LLM_QUEUE_TIMEOUT
+from app.core.metrics import gauge, register_collector
+
+# ============================
+# CONTROLE DE ADMISSÃO DAS CHAMADAS À IA
+# ============================
+# No máximo LLM_MAX_CONCURRENCY chamadas simultâneas ao provedor. As demais
+# esperam numa fila limitada (LLM_MAX_QUEUE) em que usuários logados passam
+# na frente de visitantes. Fila cheia ou espera acima de LLM_QUEUE_TIMEOUT
+# -> 503 com Retry-After, em vez de uma avalanche de 429 do provedor.
+
+PRIORITY_USER = 0
+PRIORITY_GUEST = 1
+PRIORITY_BACKGROUND = 2  # resumos das conversas: só quando sobra vaga
+
+
+class LLMGate:
+    def __init__(self, limit: int, max_queue: int, timeout: float):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+
+        self._active = 0
+        self._queued = 0
+        self._waiters = []  # heap de (prioridade, ordem de chegada, future)
+        self._seq = itertools.count()
+
+        # Métricas
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._service_ewma = 2.0  # segundos por chamada (estimativa inicial)
+
+    # ------------------------
+    # Admissão
+    # ------------------------
+    def _overloaded(self) -> HTTPException:
+        # Tempo estimado até a fila andar o suficiente para caber mais um
+        retry_after = max(1, math.ceil(self._service_ewma * (self._queued + 1) / self.limit))
+        return HTTPException(
+            status_code=503,
+            detail="Muitas pessoas usando a AtenaAI agora. Tente novamente em instantes.",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+    def check_capacity(self):
+        """Falha rápido (503) se a fila já estiver cheia — usado antes de abrir um stream"""
+        if self._active >= self.limit and self._queued >= self.max_queue:
+            self.rejected += 1
+            raise self._overloaded()
+
+    async def acquire(self, priority: int = PRIORITY_GUEST):
+        start = monotonic()
+
+        if self._active < self.limit and self._queued == 0:
+            self._active += 1
+            self._record_wait(start)
+            return
+
+        if self._queued >= self.max_queue:
+            self.rejected += 1
+            raise self._overloaded()
+
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+        self._queued += 1
+
+        try:
+            await asyncio.wait_for(fut, timeout=self.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if fut.done() and not fut.cancelled():
+                # A vaga chegou junto com o timeout/cancelamento: é nossa
+                if isinstance(e, asyncio.CancelledError):
+                    self.release()
+                    raise
+            else:
+                self._queued -= 1
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                self.timed_out += 1
+                raise self._overloaded()
+
+        self._record_wait(start)
+
+    def release(self):
+        # Entrega a vaga direto ao próximo da fila (maior prioridade primeiro)
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                self._queued -= 1
+                fut.set_result(None)
+                return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_GUEST):
+        await self.acquire(priority)
+        start = monotonic()
+        try:
+            yield
+        finally:
+            self._service_ewma = 0.9 * self._service_ewma + 0.1 * (monotonic() - start)
+            self.release()
+
+    # ------------------------
+    # Métricas
+    # ------------------------
+    def _record_wait(self, start: float):
+        waited = monotonic() - start
+        self.admitted += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+
+    def stats(self) -> dict:
+        return {
+            "active": self._active,
+            "queued": self._queued,
+            "limit": self.limit,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "wait_avg_ms": round(self.wait_total / self.admitted * 1000, 1) if self.admitted else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 1),
+        }
+
+
+llm_gate = LLMGate(LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE, LLM_QUEUE_TIMEOUT)
+
+LLM_GATE = gauge("atena_llm_gate", "Controle de admissão da IA (vagas, fila e contadores)", ("field",))
+
+
+@register_collector
+def _collect_gate_stats():
+    for field, value in llm_gate.stats().items():
+        LLM_GATE.set(value, field=field)
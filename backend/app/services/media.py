@@ -0,0 +1,145 @@
+import hashlib
+import logging
+import os
+import tempfile
+from typing import BinaryIO, Optional
+
+from fastapi import HTTPException
+
+from app.core.config import UPLOAD_DIR, PROFILE_IMAGE_MAX_BYTES, THUMBNAIL_SIZES
+
+logger = logging.getLogger(__name__)
+
+# ============================
+# FOTOS DE PERFIL
+# ============================
+# O tamanho da requisição é limitado antes da leitura do formulário
+# (BodySizeLimitMiddleware, em app/main.py): PROFILE_IMAGE_MAX_BYTES mais
+# PROFILE_FORM_OVERHEAD_BYTES para os outros campos e o envelope multipart.
+# Depois o arquivo é copiado em blocos para um temporário, calculando o
+# SHA-256 no caminho e conferindo o tamanho da imagem em si. O nome final é
+# o próprio hash:
+#     uploads/images/<sha256>.<ext>
+# Arquivos idênticos viram um só. Miniaturas WebP (<sha256>_<lado>.webp) são
+# geradas em segundo plano depois da resposta.
+
+IMAGES_DIR = os.path.join(UPLOAD_DIR, "images")
+PROFILE_FORM_OVERHEAD_BYTES = 64 * 1024
+CHUNK_SIZE = 64 * 1024
+
+# Assinaturas dos formatos aceitos (a extensão enviada não é confiável)
+_SIGNATURES = (
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+)
+
+
+def _sniff_extension(head: bytes) -> Optional[str]:
+    for signature, ext in _SIGNATURES:
+        if head.startswith(signature):
+            return ext
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+
+def store_image(source: BinaryIO) -> str:
+    """
+    Grava a imagem de `source` e devolve o caminho relativo a UPLOAD_DIR
+    ("images/<sha256>.<ext>"). 413 se a imagem passar de
+    PROFILE_IMAGE_MAX_BYTES, 400 se não for imagem. Não limita o upload em
+    si: quando isto roda o corpo já foi recebido (ver BodySizeLimitMiddleware).
+    """
+    os.makedirs(IMAGES_DIR, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    ext = None
+
+    fd, tmp_path = tempfile.mkstemp(dir=IMAGES_DIR, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            while chunk := source.read(CHUNK_SIZE):
+                if ext is None:
+                    ext = _sniff_extension(chunk[:16])
+                    if ext is None:
+                        raise HTTPException(status_code=400, detail="Formato de imagem não suportado")
+
+                size += len(chunk)
+                if size > PROFILE_IMAGE_MAX_BYTES:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"Imagem maior que {PROFILE_IMAGE_MAX_BYTES // (1024 * 1024)} MB"
+                    )
+
+                digest.update(chunk)
+                tmp.write(chunk)
+
+        if ext is None:
+            raise HTTPException(status_code=400, detail="Arquivo vazio")
+
+        name = f"{digest.hexdigest()}{ext}"
+        final_path = os.path.join(IMAGES_DIR, name)
+
+        if os.path.exists(final_path):
+            os.remove(tmp_path)  # mesmo conteúdo já salvo: reaproveita
+        else:
+            os.replace(tmp_path, final_path)
+
+        return f"images/{name}"
+
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def thumbnail_path(relative: str, size: int) -> str:
+    """"images/<hash>.jpg" -> "images/<hash>_128.webp\""""
+    return f"{os.path.splitext(relative)[0]}_{size}.webp"
+
+
+def thumbnail_urls(image_url: Optional[str]) -> Optional[dict]:
+    """URLs das miniaturas de uma foto salva por store_image (senão None)"""
+    if not image_url or "/uploads/images/" not in image_url:
+        return None
+    base = os.path.splitext(image_url)[0]
+    return {str(size): f"{base}_{size}.webp" for size in THUMBNAIL_SIZES}
+
+
+def generate_thumbnails(relative: str):
+    """Tarefa de segundo plano: miniaturas WebP quadradas (corte central)"""
+    try:
+        from PIL import Image, ImageOps  # import tardio: só quem gera miniaturas paga
+    except ImportError:
+        logger.warning("Pillow não instalado: miniaturas não geradas")
+        return
+
+    source = os.path.join(UPLOAD_DIR, relative)
+    try:
+        with Image.open(source) as img:
+            img = ImageOps.exif_transpose(img)  # fotos de celular giradas
+            if img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+
+            for size in sorted(THUMBNAIL_SIZES, reverse=True):
+                target = os.path.join(UPLOAD_DIR, thumbnail_path(relative, size))
+                if os.path.exists(target):
+                    continue
+                thumb = ImageOps.fit(img, (size, size), Image.LANCZOS)
+                tmp = f"{target}.part"
+                thumb.save(tmp, "WEBP", quality=80, method=4)
+                os.replace(tmp, target)
+    except Exception as e:
+        logger.error(f"Erro ao gerar miniaturas de {relative}: {e}", exc_info=True)
+
+
+def remove_image(relative: str):
+    """Apaga a foto e suas miniaturas (o chamador garante que ninguém mais a usa)"""
+    paths = [relative] + [thumbnail_path(relative, size) for size in THUMBNAIL_SIZES]
+    for path in paths:
+        try:
+            os.remove(os.path.join(UPLOAD_DIR, path))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,109 @@
+import html
+import re
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+# ============================
+# BUSCA TEXTUAL NO HISTÓRICO
+# ============================
+# Postgres: messages.search_vector (tsvector gerado, português + inglês) com
+#           índice GIN; ranking por ts_rank_cd e trechos com ts_headline.
+# SQLite:   tabela FTS5 messages_fts (desenvolvimento local); ranking bm25.
+# Nenhum dos dois faz LIKE '%...%': a consulta sempre passa pelo índice.
+# Migração 0008.
+
+# Marcadores internos do trecho: o texto é escapado e só depois viram <mark>
+_START, _STOP = "\x02", "\x03"
+
+_PG_SEARCH = f"""
+    SELECT hit.message_id, hit.conversation_id, hit.title, hit.role, hit.created_at, hit.score,
+           ts_headline(
+               CAST(:config AS regconfig), m.content, hit.query,
+               'StartSel={_START}, StopSel={_STOP}, MaxFragments=2, MaxWords=25, MinWords=8'
+           ) AS snippet
+    FROM (
+        SELECT m.id AS message_id, m.conversation_id, c.title, m.role, m.created_at,
+               ts_rank_cd(m.search_vector, q.query) AS score, q.query
+        FROM messages m
+        JOIN conversations c ON c.id = m.conversation_id,
+             (SELECT {{query}} AS query) q
+        WHERE c.user_id = :user_id AND m.search_vector @@ q.query
+        ORDER BY score DESC, m.id DESC
+        LIMIT :limit OFFSET :offset
+    ) hit
+    JOIN messages m ON m.id = hit.message_id
+    ORDER BY hit.score DESC, hit.message_id DESC
+"""
+
+_SQLITE_SEARCH = text(f"""
+    SELECT m.id AS message_id, m.conversation_id, c.title, m.role, m.created_at,
+           -bm25(messages_fts) AS score,
+           snippet(messages_fts, 0, '{_START}', '{_STOP}', '…', 16) AS snippet
+    FROM messages_fts
+    JOIN messages m ON m.id = messages_fts.rowid
+    JOIN conversations c ON c.id = m.conversation_id
+    WHERE messages_fts MATCH :query AND c.user_id = :user_id
+    ORDER BY bm25(messages_fts), m.id DESC
+    LIMIT :limit OFFSET :offset
+""")
+
+
+def _pg_config(language: Optional[str]) -> Optional[str]:
+    if not language:
+        return None
+    return "english" if language.lower().startswith("en") else "portuguese"
+
+
+def _pg_statement(language: Optional[str]):
+    """Idioma informado -> só aquele dicionário; sem idioma -> pt OU en"""
+    config = _pg_config(language)
+    if config:
+        query = f"websearch_to_tsquery('{config}', :query)"
+    else:
+        query = "(websearch_to_tsquery('portuguese', :query) || websearch_to_tsquery('english', :query))"
+    return text(_PG_SEARCH.replace("{query}", query)), config or "portuguese"
+
+
+def _fts5_query(q: str) -> str:
+    """Cada palavra vira um termo entre aspas (sem operadores FTS5 do usuário)"""
+    terms = re.findall(r"\w+", q, flags=re.UNICODE)
+    return " ".join(f'"{t}"' for t in terms)
+
+
+def _render_snippet(raw: Optional[str]) -> str:
+    escaped = html.escape(raw or "")
+    return escaped.replace(_START, "<mark>").replace(_STOP, "</mark>")
+
+
+def search_messages(
+    db: Session,
+    user_id: int,
+    q: str,
+    limit: int,
+    offset: int = 0,
+    language: Optional[str] = None
+) -> list:
+    """Até `limit` mensagens do usuário que casam com `q`, das mais relevantes"""
+    params = {"user_id": user_id, "limit": limit, "offset": offset}
+
+    if db.bind.dialect.name == "postgresql":
+        statement, config = _pg_statement(language)
+        params.update(query=q, config=config)
+    else:
+        query = _fts5_query(q)
+        if not query:
+            return []
+        statement = _SQLITE_SEARCH
+        params.update(query=query)
+
+    try:
+        rows = db.execute(statement, params).mappings().all()
+    except OperationalError:
+        # SQLite sem FTS5 (a migração 0008 pulou o índice)
+        raise HTTPException(status_code=501, detail="Busca indisponível neste banco")
+
+    return [{**row, "snippet": _render_snippet(row["snippet"])} for row in rows]
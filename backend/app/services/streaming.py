@@ -0,0 +1,91 @@
+import json
+import logging
+from typing import Awaitable, Callable, AsyncIterator, Optional
+
+import anyio
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+# ============================
+# STREAMING DE RESPOSTAS (NDJSON)
+# ============================
+# Cada linha é um JSON independente:
+#   {"type": "start", "conversation_id": 1}
+#   {"type": "token", "content": "Olá"}
+#   {"type": "done",  "reply": "Olá, tudo bem?", "conversation_id": 1}
+#   {"type": "error", "detail": "..."}
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def ndjson_event(event_type: str, **data) -> str:
+    """Serializa um evento do stream como uma linha NDJSON"""
+    return json.dumps({"type": event_type, **data}, ensure_ascii=False) + "\n"
+
+
+async def stream_reply(
+    tokens: AsyncIterator[str],
+    on_finish: Optional[Callable[[str, bool], Awaitable[Optional[dict]]]] = None,
+    start: Optional[dict] = None
+) -> AsyncIterator[str]:
+    """
+    Repassa os tokens da IA para o cliente e chama `on_finish(reply, completed)`
+    quando o stream termina — inclusive se o cliente desconectar no meio,
+    caso em que `completed` é False e `reply` contém só o que já foi gerado.
+    """
+    parts = []
+    completed = False
+    extra = None
+
+    if start is not None:
+        yield ndjson_event("start", **start)
+
+    try:
+        async for token in tokens:
+            parts.append(token)
+            yield ndjson_event("token", content=token)
+        completed = True
+
+    except HTTPException as e:
+        # Ex.: 503 do controle de admissão depois que o stream já começou
+        yield ndjson_event("error", detail=e.detail, status=e.status_code)
+
+    except Exception as e:
+        logger.error(f"Erro durante o streaming: {str(e)}", exc_info=True)
+        yield ndjson_event("error", detail="Erro ao gerar resposta.")
+
+    finally:
+        # Fecha o stream upstream (para de gerar tokens se o cliente saiu) e
+        # persiste o turno, protegidos do cancelamento causado pela desconexão
+        with anyio.CancelScope(shield=True):
+            aclose = getattr(tokens, "aclose", None)
+            if aclose:
+                try:
+                    await aclose()
+                except Exception:
+                    pass
+
+            if on_finish:
+                try:
+                    extra = await on_finish("".join(parts), completed)
+                except Exception as e:
+                    logger.error(f"Erro ao salvar resposta do stream: {str(e)}", exc_info=True)
+
+    if completed:
+        yield ndjson_event("done", reply="".join(parts), **(extra or {}))
+
+
+async def replay_tokens(text: str) -> AsyncIterator[str]:
+    """Entrega uma resposta pronta (ex.: do cache) pelo mesmo formato de stream"""
+    yield text
+
+
+def ndjson_response(events: AsyncIterator[str]) -> StreamingResponse:
+    """Resposta HTTP chunked sem buffering em proxies (nginx/Railway)"""
+    return StreamingResponse(
+        events,
+        media_type=NDJSON_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,234 @@
+import asyncio
+import logging
+import re
+from typing import Optional
+
+from sqlalchemy import func, select, update
+
+from app.core.config import (
+    AI_MODEL,
+    AI_SUMMARY_MODEL,
+    MAX_MESSAGE_HISTORY,
+    SUMMARIZER,
+    SUMMARY_KEEP_RECENT,
+    SUMMARY_MAX_TOKENS,
+)
+from app.database.database import AsyncSessionLocal
+from app.models.conversation import Conversation
+from app.models.message import Message, estimate_tokens
+from app.services.ai_service import complete
+from app.services.history_cache import set_summary
+from app.services.llm_gate import PRIORITY_BACKGROUND
+from app.services.token_usage import add_usage
+
+logger = logging.getLogger(__name__)
+
+# ============================
+# RESUMO ACUMULADO DAS CONVERSAS LONGAS
+# ============================
+# Depois de cada turno salvo, a conversa entra numa fila deste processo. Um
+# único worker em segundo plano verifica se há mensagens fora da janela de
+# contexto (mais de MAX_MESSAGE_HISTORY sem resumo) e, se houver, incorpora
+# todas menos as SUMMARY_KEEP_RECENT últimas ao resumo salvo na conversa
+# (conversations.summary / summary_until_id). Cada rodada só lê as
+# mensagens novas: o resumo é atualizado de forma incremental.
+#
+# O request nunca espera por isso; a chamada à IA do resumo entra no
+# controle de admissão com a menor prioridade. Se falhar, a conversa
+# simplesmente tenta de novo no próximo turno.
+
+# Mensagens incorporadas por chamada ao resumidor (conversas antigas podem
+# ter centenas de mensagens sem resumo na primeira rodada)
+FOLD_CHUNK = 40
+
+_SUMMARY_PROMPT = (
+    "Você mantém o resumo de uma conversa de estudo entre um aluno e a Atena, "
+    "uma tutora. Atualize o resumo atual com as novas mensagens. Preserve os "
+    "temas estudados, dúvidas do aluno, explicações e conclusões importantes, "
+    "exercícios e combinados. Escreva em tópicos curtos, no idioma da conversa, "
+    "com no máximo {max_tokens} tokens. Responda só com o resumo."
+)
+
+
+def _speaker(role: str) -> str:
+    return "Aluno" if role == "user" else "Atena"
+
+
+def _first_sentence(text: str, limit: int = 160) -> str:
+    text = re.sub(r"[*`_]+", "", text or "")  # ênfase/código em markdown
+    text = re.sub(r"^\s*[#>]+", " ", text, flags=re.MULTILINE)  # títulos e citações
+    text = " ".join(text.split())
+    sentence = re.split(r"(?<=[.!?])\s", text, maxsplit=1)[0]
+    return sentence if len(sentence) <= limit else sentence[:limit - 1].rstrip() + "…"
+
+
+def local_summary(previous: Optional[str], messages: list, max_tokens: int = SUMMARY_MAX_TOKENS) -> str:
+    """
+    Resumidor local e determinístico (SUMMARIZER=local): uma linha com a
+    primeira frase de cada mensagem, mantendo as linhas mais recentes que
+    cabem em `max_tokens`. Mesma entrada -> mesmo resumo.
+    """
+    lines = previous.splitlines() if previous else []
+    lines += [f"- {_speaker(m['role'])}: {_first_sentence(m['content'])}" for m in messages]
+
+    kept = []
+    used = 0
+    for line in reversed(lines):
+        tokens = estimate_tokens(line)
+        if used + tokens > max_tokens:
+            break
+        used += tokens
+        kept.append(line)
+
+    return "\n".join(reversed(kept))
+
+
+async def llm_summary(previous: Optional[str], messages: list, usage: Optional[dict] = None) -> str:
+    """Resumo escrito pelo modelo (SUMMARIZER=llm)"""
+    transcript = "\n\n".join(f"{_speaker(m['role'])}: {m['content']}" for m in messages)
+    prompt = [
+        {"role": "system", "content": _SUMMARY_PROMPT.format(max_tokens=SUMMARY_MAX_TOKENS)},
+        {"role": "user", "content": f"Resumo atual:\n{previous or '(vazio)'}\n\nNovas mensagens:\n{transcript}"},
+    ]
+    reply = await complete(
+        prompt, model=AI_SUMMARY_MODEL or AI_MODEL, priority=PRIORITY_BACKGROUND, usage=usage
+    )
+    return reply.strip()
+
+
+class RollingSummaries:
+    def __init__(self, mode: str):
+        self.mode = mode
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._queued: set = set()  # conversas já na fila (um pedido basta)
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+        # Métricas
+        self.folds = 0
+        self.folded_messages = 0
+        self.conflicts = 0
+        self.failures = 0
+
+    def schedule(self, conversation_id: Optional[int], user_id: int):
+        """Não bloqueia: só enfileira (chamado depois de salvar um turno)"""
+        if self.mode == "off" or self._closing or conversation_id is None:
+            return
+        if conversation_id in self._queued:
+            return
+
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+        self._queued.add(conversation_id)
+        self._queue.put_nowait((conversation_id, user_id))
+
+    async def _run(self):
+        while True:
+            conversation_id, user_id = await self._queue.get()
+            # Sai do conjunto antes de processar: um turno que chegue agora
+            # agenda uma nova rodada
+            self._queued.discard(conversation_id)
+            try:
+                await self.summarize(conversation_id, user_id)
+            except Exception as e:
+                self.failures += 1
+                logger.warning(f"Falha ao resumir a conversa {conversation_id}: {e!r}")
+
+    async def _summarize_chunk(self, previous: Optional[str], messages: list, usage: dict) -> str:
+        if self.mode == "local":
+            return local_summary(previous, messages)
+        return await llm_summary(previous, messages, usage)
+
+    async def summarize(self, conversation_id: int, user_id: int):
+        """Incorpora ao resumo as mensagens que já saíram da janela de contexto"""
+        async with AsyncSessionLocal() as db:
+            row = (await db.execute(
+                select(Conversation.summary, Conversation.summary_until_id)
+                .where(Conversation.id == conversation_id)
+            )).first()
+            if row is None:
+                return
+
+            summary, until = row.summary, row.summary_until_id or 0
+            pending = (await db.scalars(
+                select(Message.id)
+                .where(Message.conversation_id == conversation_id, Message.id > until)
+                .order_by(Message.id)
+            )).all()
+
+            # Tudo o que não está no resumo ainda cabe na janela
+            if len(pending) <= MAX_MESSAGE_HISTORY:
+                return
+
+            to_fold = pending[:len(pending) - min(SUMMARY_KEEP_RECENT, MAX_MESSAGE_HISTORY)]
+            for start in range(0, len(to_fold), FOLD_CHUNK):
+                chunk = to_fold[start:start + FOLD_CHUNK]
+                rows = (await db.execute(
+                    select(Message.role, Message.content)
+                    .where(Message.id.in_(chunk))
+                    .order_by(Message.id)
+                )).all()
+                # Fecha a transação de leitura: a conexão volta ao pool
+                # enquanto o resumidor (a IA) trabalha
+                await db.rollback()
+
+                usage = {}
+                new_summary = await self._summarize_chunk(
+                    summary, [{"role": r.role, "content": r.content} for r in rows], usage
+                )
+
+                # Condição em summary_until_id: se outro worker resumiu no
+                # meio tempo, esta rodada é descartada. updated_at é mantido
+                # (o resumo não é atividade do usuário na barra lateral).
+                result = await db.execute(
+                    update(Conversation)
+                    .where(
+                        Conversation.id == conversation_id,
+                        func.coalesce(Conversation.summary_until_id, 0) == until
+                    )
+                    .values(
+                        summary=new_summary,
+                        summary_until_id=chunk[-1],
+                        updated_at=Conversation.updated_at
+                    )
+                )
+                if result.rowcount == 0:
+                    await db.rollback()
+                    self.conflicts += 1
+                    return
+
+                # Tokens do resumo contam no consumo do dia (sem contar request)
+                await add_usage(db, user_id, usage, requests=0)
+                await db.commit()
+
+                summary, until = new_summary, chunk[-1]
+                set_summary(conversation_id, summary, until)
+                self.folds += 1
+                self.folded_messages += len(chunk)
+
+    async def close(self):
+        """Desligamento: descarta a fila (o resumo é derivado, nada se perde)"""
+        self._closing = True
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "queued": len(self._queued),
+            "folds": self.folds,
+            "folded_messages": self.folded_messages,
+            "conflicts": self.conflicts,
+            "failures": self.failures,
+        }
+
+
+summaries = RollingSummaries(SUMMARIZER)
@@ -0,0 +1,110 @@
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from fastapi import Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import TOKEN_QUOTAS
+from app.core.dependencies import get_current_user
+from app.database.database import get_async_db
+from app.models.message import estimate_tokens
+from app.models.token_usage import TokenUsageDaily
+
+# ============================
+# CONSUMO DE TOKENS E COTA DIÁRIA
+# ============================
+# Cada resposta salva soma seus tokens (response.usage) na linha
+# (user_id, dia UTC) de token_usage_daily, no mesmo commit das mensagens.
+# A cota lê só essa linha pela chave primária: nunca varre `messages`.
+
+
+def today() -> date:
+    return datetime.utcnow().date()
+
+
+def fill_usage(usage: Optional[dict], model: str, raw):
+    """Copia `response.usage` do provedor para o dict do chamador"""
+    if usage is None or raw is None:
+        return
+    usage.update(
+        model=model,
+        prompt_tokens=getattr(raw, "prompt_tokens", 0) or 0,
+        completion_tokens=getattr(raw, "completion_tokens", 0) or 0,
+    )
+
+
+def estimate_usage(prompt: list, reply: str) -> dict:
+    """Sem `usage` do provedor (ex.: cliente desconectou no meio do stream)"""
+    return {
+        "prompt_tokens": sum(estimate_tokens(m.get("content")) for m in prompt),
+        "completion_tokens": estimate_tokens(reply),
+    }
+
+
+async def add_usage(db: AsyncSession, user_id: int, usage: Optional[dict], requests: int = 1):
+    """
+    Soma o uso na linha do dia com um UPSERT atômico. Não faz commit:
+    entra na transação que salva as mensagens do turno. `requests` > 1
+    quando o uso de vários turnos chega somado (gravação em lote).
+    """
+    if not usage:
+        return
+
+    table = TokenUsageDaily.__table__
+    insert = (postgresql if db.bind.dialect.name == "postgresql" else sqlite).insert
+
+    prompt_tokens = usage.get("prompt_tokens") or 0
+    completion_tokens = usage.get("completion_tokens") or 0
+
+    stmt = insert(table).values(
+        user_id=user_id,
+        day=today(),
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        requests=requests,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.day],
+        set_={
+            "prompt_tokens": table.c.prompt_tokens + prompt_tokens,
+            "completion_tokens": table.c.completion_tokens + completion_tokens,
+            "requests": table.c.requests + requests,
+        },
+    )
+    await db.execute(stmt)
+
+
+async def tokens_used_today(db: AsyncSession, user_id: int) -> int:
+    used = await db.scalar(
+        select(TokenUsageDaily.prompt_tokens + TokenUsageDaily.completion_tokens)
+        .where(TokenUsageDaily.user_id == user_id, TokenUsageDaily.day == today())
+    )
+    return used or 0
+
+
+# ============================
+# DEPENDÊNCIA (ROTAS DE CHAT)
+# ============================
+async def enforce_token_quota(
+    current_user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """429 quando o usuário já gastou a cota diária do seu tipo de conta"""
+    if not current_user:
+        return
+
+    quota = TOKEN_QUOTAS.get(current_user.account_type)
+    if quota is None:
+        return
+
+    if await tokens_used_today(db, current_user.id) >= quota:
+        now = datetime.utcnow()
+        tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        retry_after = max(1, int((tomorrow - now).total_seconds()))
+        raise HTTPException(
+            status_code=429,
+            detail={"message": "Cota diária de uso da IA atingida.", "retry_after": retry_after},
+            headers={"Retry-After": str(retry_after)}
+        )
@@ -0,0 +1,187 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import insert, update
+
+from app.core.config import PERSIST_DURABILITY, PERSIST_BATCH_INTERVAL_MS, PERSIST_BATCH_MAX
+from app.database.database import AsyncSessionLocal
+from app.models.conversation import Conversation
+from app.models.message import Message
+from app.services.history_cache import append_history, invalidate_history
+from app.services.token_usage import add_usage
+
+logger = logging.getLogger(__name__)
+
+# ============================
+# WRITE-BEHIND DOS TURNOS DO CHAT (PERSIST_MODE=batched)
+# ============================
+# Os turnos de vários requests simultâneos são acumulados por alguns
+# milissegundos e gravados numa só transação: um INSERT de várias linhas em
+# `messages`, um UPDATE de updated_at por lote e um UPSERT de consumo por
+# usuário — um commit (fsync) para o lote inteiro.
+#
+# Durabilidade (PERSIST_DURABILITY):
+#   commit  -> submit() só retorna depois do commit do lote (group commit)
+#   enqueue -> submit() retorna na hora; se o processo cair, o lote em
+#              andamento se perde
+
+
+@dataclass
+class Turn:
+    conversation_id: int
+    user_id: int
+    messages: list  # dicts prontos para Message (role, content, tokens...)
+    usage: dict = field(default_factory=dict)
+    cached: list = field(default_factory=list)  # linhas do cache de histórico (recebem o id)
+
+
+class WriteBehind:
+    def __init__(self, interval: float, max_batch: int, durability: str):
+        self.interval = interval
+        self.max_batch = max_batch
+        self.durability = durability
+
+        self._pending: list = []  # (Turn, future | None)
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+        # Métricas
+        self.batches = 0
+        self.turns = 0
+        self.failures = 0
+
+    async def submit(self, turn: Turn):
+        # O cache já reflete o turno: a próxima pergunta da conversa o vê
+        # mesmo antes do commit. Se o lote falhar, a entrada é descartada.
+        turn.cached = append_history(turn.conversation_id, *(
+            {"role": m["role"], "content": m["content"]} for m in turn.messages
+        ))
+
+        fut = asyncio.get_running_loop().create_future() if self.durability == "commit" else None
+        self._pending.append((turn, fut))
+        self._ensure_running()
+
+        if len(self._pending) >= self.max_batch:
+            self._wakeup.set()  # lote cheio: grava sem esperar o intervalo
+
+        if fut is not None:
+            await fut
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        self._wakeup.set()
+
+    async def _run(self):
+        while not (self._closing and not self._pending):
+            await self._wakeup.wait()
+            self._wakeup.clear()
+
+            # Espera o intervalo para juntar mais turnos (a menos que o lote
+            # já tenha enchido ou a API esteja desligando)
+            if not self._closing and len(self._pending) < self.max_batch:
+                await asyncio.sleep(self.interval)
+
+            while self._pending:
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+                await self._flush(batch)
+
+    async def _write(self, turns: list):
+        """Grava `turns` numa transação (um commit); levanta se qualquer um falhar"""
+        conversation_ids = {t.conversation_id for t in turns}
+
+        # Consumo somado por usuário: um UPSERT por usuário, não por turno
+        per_user: dict = {}
+        for t in turns:
+            total = per_user.setdefault(t.user_id, {"prompt_tokens": 0, "completion_tokens": 0, "requests": 0})
+            total["prompt_tokens"] += t.usage.get("prompt_tokens") or 0
+            total["completion_tokens"] += t.usage.get("completion_tokens") or 0
+            total["requests"] += 1
+
+        async with AsyncSessionLocal() as db:
+            try:
+                ids = (await db.scalars(
+                    insert(Message).returning(Message.id, sort_by_parameter_order=True),
+                    [{"conversation_id": t.conversation_id, **m} for t in turns for m in t.messages]
+                )).all()
+                await db.execute(
+                    update(Conversation)
+                    .where(Conversation.id.in_(conversation_ids))
+                    .values(updated_at=datetime.utcnow())
+                )
+                for user_id, total in per_user.items():
+                    requests = total.pop("requests")
+                    await add_usage(db, user_id, total, requests=requests)
+
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
+
+        # Ids nas linhas do cache: o resumo tira delas o que já incorporou
+        ids = iter(ids)
+        for t in turns:
+            row_ids = [next(ids) for _ in t.messages]
+            for row, row_id in zip(t.cached, row_ids):
+                row["id"] = row_id
+
+    async def _flush(self, batch: list):
+        turns = [turn for turn, _ in batch]
+        errors = [None] * len(batch)
+
+        try:
+            await self._write(turns)
+        except Exception as batch_error:
+            # Um turno ruim (ex.: conversa apagada entre o submit e o flush ->
+            # violação de FK) não pode derrubar os turnos dos outros: regrava
+            # um a um e só quem falhar recebe o erro
+            logger.warning(f"Lote de {len(turns)} turnos falhou ({batch_error!r}); gravando um a um")
+            for i, turn in enumerate(turns):
+                try:
+                    await self._write([turn])
+                except Exception as e:
+                    errors[i] = e
+
+        failed = [(turns[i], e) for i, e in enumerate(errors) if e is not None]
+        for turn, error in failed:
+            invalidate_history(turn.conversation_id)
+            logger.error(f"Erro ao gravar turno da conversa {turn.conversation_id}: {error}", exc_info=error)
+
+        self.failures += len(failed)
+        if len(failed) < len(turns):
+            self.batches += 1
+            self.turns += len(turns) - len(failed)
+
+        for (_, fut), error in zip(batch, errors):
+            if fut is not None and not fut.done():
+                if error is not None:
+                    fut.set_exception(error)
+                else:
+                    fut.set_result(None)
+
+    async def close(self):
+        """Grava o que estiver pendente (desligamento da API)"""
+        self._closing = True
+        if self._task is not None and not self._task.done():
+            self._wakeup.set()
+            await self._task
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "durability": self.durability,
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "turns": self.turns,
+            "failures": self.failures,
+            "avg_batch": round(self.turns / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+turn_writer = WriteBehind(PERSIST_BATCH_INTERVAL_MS / 1000, PERSIST_BATCH_MAX, PERSIST_DURABILITY)
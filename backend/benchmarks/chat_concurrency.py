@@ -0,0 +1,105 @@
+"""
+Benchmark de concorrência do chat (modo convidado).
+
+Substitui o cliente OpenAI por um falso que "demora" LATENCY segundos e
+dispara N chats simultâneos contra o app em processo (um único worker).
+Com o pipeline assíncrono o tempo total fica próximo de LATENCY para
+qualquer N (requisições/s escalam com N); se algo bloquear o event loop,
+o tempo cresce linearmente (N * LATENCY) e o /health fica preso na fila.
+
+Requer httpx (pip install httpx). Uso (a partir de backend/):
+    python -m benchmarks.chat_concurrency
+    python -m benchmarks.chat_concurrency --latency 0.5 --levels 1 8 32 64
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.gettempdir(), 'atena_bench.db')}"
+)
+os.environ.setdefault("AUTO_MIGRATE", "true")  # aplicadas pelo lifespan
+os.environ["AI_WARMUP_CONNECT"] = "false"  # cliente falso: nada a conectar
+
+import httpx
+
+from app.main import app
+from app.services import ai_service
+
+
+class FakeCompletions:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def create(self, **kwargs):
+        await asyncio.sleep(self.latency)
+        message = SimpleNamespace(content="Resposta simulada.")
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=message)],
+            usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5, total_tokens=15)
+        )
+
+
+class FakeAsyncClient:
+    def __init__(self, latency: float):
+        self.chat = SimpleNamespace(completions=FakeCompletions(latency))
+
+
+async def guest_chat(i: int) -> int:
+    # Um IP por requisição para não esbarrar no limite de visitantes
+    transport = httpx.ASGITransport(app=app, client=(f"10.0.{i // 250}.{i % 250 + 1}", 50000))
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        res = await client.post("/chat/", json={"text": f"Pergunta {i}", "language": "pt-BR"})
+        return res.status_code
+
+
+async def health_latency() -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        await client.get("/health")
+        return time.perf_counter() - start
+
+
+async def run_level(concurrency: int, offset: int) -> dict:
+    start = time.perf_counter()
+    chats = [asyncio.create_task(guest_chat(offset + i)) for i in range(concurrency)]
+    await asyncio.sleep(0)
+    health = await health_latency()
+    statuses = await asyncio.gather(*chats)
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "elapsed": elapsed,
+        "rps": concurrency / elapsed,
+        "health_ms": health * 1000,
+        "ok": sum(1 for s in statuses if s == 200),
+    }
+
+
+async def main(latency: float, levels: list[int]):
+    ai_service.client = FakeAsyncClient(latency)
+
+    print(f"Latência simulada do upstream: {latency * 1000:.0f} ms\n")
+    print(f"{'concorrência':>12} {'tempo (s)':>10} {'req/s':>8} {'serial (s)':>11} {'/health (ms)':>13} {'200 OK':>7}")
+
+    async with app.router.lifespan_context(app):
+        offset = 0
+        for level in levels:
+            r = await run_level(level, offset)
+            offset += level
+            print(
+                f"{r['concurrency']:>12} {r['elapsed']:>10.2f} {r['rps']:>8.1f} "
+                f"{level * latency:>11.2f} {r['health_ms']:>13.1f} {r['ok']:>7}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.5, help="latência simulada da IA (s)")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 16, 64])
+    args = parser.parse_args()
+    asyncio.run(main(args.latency, args.levels))
@@ -0,0 +1,129 @@
+"""
+Relatório de subida a frio da API (import + lifespan).
+
+Roda `python -X importtime -c "import app.main"` num processo novo e mostra:
+- tempo total dos imports e o tempo próprio somado por pacote;
+- os módulos mais lentos (tempo acumulado, incluindo o que eles importam);
+- com --lifespan, a duração de cada etapa do lifespan (migrate, warm_db,
+  warm_ai), lida de `app.main.startup_report`.
+
+Use --json para acrescentar uma linha por execução a um arquivo e
+acompanhar a duração da subida entre versões:
+
+    python -m benchmarks.cold_start
+    python -m benchmarks.cold_start --lifespan --json startup_history.jsonl
+
+Não precisa de httpx. Rode a partir de backend/.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from datetime import datetime, timezone
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+_LIFESPAN_SNIPPET = """
+import asyncio, json
+from app.main import app, startup_report
+
+async def run():
+    async with app.router.lifespan_context(app):
+        pass
+
+asyncio.run(run())
+print(json.dumps(startup_report))
+"""
+
+
+def _run(code: str, importtime: bool = False) -> subprocess.CompletedProcess:
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(cmd, cwd=backend, capture_output=True, text=True)
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr[-4000:])
+        raise SystemExit(f"Falha ao executar: {' '.join(cmd[:-1])} ...")
+    return result
+
+
+def profile_imports() -> list:
+    """[(módulo, self_us, cumulativo_us, profundidade)] na ordem do -X importtime"""
+    stderr = _run("import app.main", importtime=True).stderr
+    entries = []
+    for line in stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append((module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return entries
+
+
+def by_package(entries: list) -> dict:
+    totals = defaultdict(int)
+    for module, self_us, _, _ in entries:
+        totals[module.split(".")[0]] += self_us
+    return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+
+def measure_lifespan() -> dict:
+    stdout = _run(_LIFESPAN_SNIPPET).stdout.strip().splitlines()
+    return json.loads(stdout[-1])
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(top: int, lifespan: bool, json_path):
+    from app.core.config import API_VERSION
+
+    entries = profile_imports()
+    total_ms = sum(self_us for _, self_us, _, _ in entries) / 1000
+    packages = by_package(entries)
+
+    print(f"import app.main: {total_ms:.0f} ms em {len(entries)} módulos\n")
+    print("tempo próprio por pacote:")
+    for name, self_us in list(packages.items())[:top]:
+        print(f"  {name:<28} {self_us / 1000:8.1f} ms  {self_us / 10 / total_ms:5.1f}%")
+
+    print(f"\n{top} módulos mais lentos (acumulado):")
+    for module, _, cumulative_us, _ in sorted(entries, key=lambda e: -e[2])[:top]:
+        print(f"  {module:<48} {cumulative_us / 1000:8.1f} ms")
+
+    report = None
+    if lifespan:
+        report = measure_lifespan()
+        print("\nlifespan:")
+        for phase, seconds in report.items():
+            print(f"  {phase:<12} {seconds * 1000:8.1f} ms")
+
+    if json_path:
+        record = {
+            "at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "version": API_VERSION,
+            "revision": _git_revision(),
+            "import_ms": round(total_ms, 1),
+            "packages_ms": {name: round(us / 1000, 1) for name, us in list(packages.items())[:top]},
+            "lifespan": report,
+        }
+        with open(json_path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+        print(f"\nregistro acrescentado a {json_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=15, help="linhas nas tabelas")
+    parser.add_argument("--lifespan", action="store_true", help="mede também o lifespan (conecta ao banco)")
+    parser.add_argument("--json", dest="json_path", help="arquivo .jsonl para acompanhar entre versões")
+    args = parser.parse_args()
+
+    main(args.top, args.lifespan, args.json_path)
@@ -0,0 +1,123 @@
+"""
+Benchmark da serialização do histórico (GET /conversations/{id}).
+
+Monta em memória uma conversa grande de tutoria (perguntas curtas, respostas
+longas em markdown) e compara, por resposta:
+
+- antes:  response_model do FastAPI (validação -> dict JSON -> json.dumps
+          do JSONResponse), sem compressão;
+- depois: app.core.responses.json_response (dump_json do pydantic-core) e o
+          tamanho/tempo da compressão gzip e brotli (se instalado).
+
+    python -m benchmarks.history_payload --messages 400 --repeat 50
+
+Não precisa de banco nem de chave da OpenAI. Rode a partir de backend/.
+"""
+import argparse
+import gzip
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from app.core.config import RESPONSE_GZIP_LEVEL, RESPONSE_BROTLI_QUALITY
+from app.core.responses import brotli, json_response
+from app.schemas.chat import ConversationDetail
+
+_WORDS = (
+    "fotossíntese clorofila energia luz glicose oxigênio célula membrana equação "
+    "derivada integral limite função variável gráfico exemplo passo resultado "
+    "revolução império economia sociedade período causa consequência análise "
+    "verbo sujeito predicado oração concordância texto interpretação autor"
+).split()
+
+
+def _paragraph(rng: random.Random, words: int) -> str:
+    text = " ".join(rng.choice(_WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def _answer(rng: random.Random) -> str:
+    parts = ["## Explicação", _paragraph(rng, 60), "### Passo a passo"]
+    parts += [f"{i}. {_paragraph(rng, 18)}" for i in range(1, 6)]
+    parts += ["```python", "resultado = sum(x ** 2 for x in range(10))", "```", _paragraph(rng, 40)]
+    return "\n\n".join(parts)
+
+
+def fixture(messages: int, seed: int = 42) -> dict:
+    """Dict no formato que get_conversation monta (mensagens como Rows)"""
+    rng = random.Random(seed)
+    start = datetime(2026, 3, 1, 14, 0)
+    rows = [
+        SimpleNamespace(
+            id=i + 1,
+            role="user" if i % 2 == 0 else "assistant",
+            content=_paragraph(rng, 20) if i % 2 == 0 else _answer(rng),
+            created_at=start + timedelta(seconds=30 * i),
+        )
+        for i in range(messages)
+    ]
+    return {
+        "id": 1,
+        "title": "Revisão para a prova",
+        "created_at": start,
+        "updated_at": rows[-1].created_at,
+        "messages": rows,
+        "prev_cursor": None,
+        "next_cursor": None,
+    }
+
+
+def before(data: dict) -> bytes:
+    # O que o FastAPI faz com response_model + JSONResponse padrão
+    model = ConversationDetail.model_validate(data, from_attributes=True)
+    return JSONResponse(model.model_dump(mode="json")).body
+
+
+def after(adapter: TypeAdapter, data: dict) -> bytes:
+    return json_response(adapter, data).body
+
+
+def bench(fn, repeat: int) -> tuple:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return result, statistics.median(timings) * 1000
+
+
+def main(messages: int, repeat: int):
+    data = fixture(messages)
+    adapter = TypeAdapter(ConversationDetail)
+
+    old_body, old_ms = bench(lambda: before(data), repeat)
+    new_body, new_ms = bench(lambda: after(adapter, data), repeat)
+    gz_body, gz_ms = bench(lambda: gzip.compress(new_body, compresslevel=RESPONSE_GZIP_LEVEL, mtime=0), repeat)
+
+    kb = lambda n: f"{n / 1024:8.1f} KB"
+    print(f"conversa: {messages} mensagens, mediana de {repeat} execuções")
+    print(f"antes  (response_model + json.dumps): {old_ms:7.2f} ms  {kb(len(old_body))}")
+    print(f"depois (dump_json):                   {new_ms:7.2f} ms  {kb(len(new_body))}  ({old_ms / new_ms:.1f}x)")
+    print(f"  + gzip nível {RESPONSE_GZIP_LEVEL}:                   {gz_ms:7.2f} ms  {kb(len(gz_body))}"
+          f"  ({len(new_body) / len(gz_body):.1f}x menor)")
+
+    if brotli is not None:
+        br_body, br_ms = bench(lambda: brotli.compress(new_body, quality=RESPONSE_BROTLI_QUALITY), repeat)
+        print(f"  + brotli q{RESPONSE_BROTLI_QUALITY}:                      {br_ms:7.2f} ms  {kb(len(br_body))}"
+              f"  ({len(new_body) / len(br_body):.1f}x menor)")
+    else:
+        print("  + brotli: não instalado (pip install brotli)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=400, help="mensagens na conversa")
+    parser.add_argument("--repeat", type=int, default=50, help="execuções por medição")
+    args = parser.parse_args()
+
+    main(args.messages, args.repeat)
@@ -0,0 +1,90 @@
+"""
+Benchmark de throughput do login (bcrypt).
+
+Cria um usuário num SQLite temporário e dispara N logins simultâneos contra
+o app em processo, medindo logins/s, latência p50/p95 e o tempo de resposta
+do /health durante a rajada. Compare o pool de processos com o hash inline:
+
+    python -m benchmarks.login_throughput --workers 0   # hash no threadpool
+    python -m benchmarks.login_throughput --workers 4   # pool de processos
+
+Requer httpx (pip install httpx). Rode a partir de backend/.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "atena_login_bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ["AUTO_MIGRATE"] = "true"  # aplicadas pelo lifespan
+os.environ.setdefault("AI_WARMUP_CONNECT", "false")
+
+import httpx
+
+EMAIL = "bench@atena.ai"
+PASSWORD = "senha-de-benchmark"
+
+
+async def timed_login(client: httpx.AsyncClient) -> tuple:
+    start = time.perf_counter()
+    res = await client.post("/auth/login", data={"username": EMAIL, "password": PASSWORD})
+    return res.status_code, time.perf_counter() - start
+
+
+async def health_latency(client: httpx.AsyncClient) -> float:
+    start = time.perf_counter()
+    await client.get("/health")
+    return time.perf_counter() - start
+
+
+async def main(concurrency: int):
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await client.post("/auth/register", json={
+                "email": EMAIL, "password": PASSWORD,
+                "full_name": "Benchmark", "account_type": "student"
+            })
+            # Aquece o pool (spawn dos processos) fora da medição
+            await timed_login(client)
+
+            start = time.perf_counter()
+            logins = [asyncio.create_task(timed_login(client)) for _ in range(concurrency)]
+            await asyncio.sleep(0.05)
+            health = await health_latency(client)
+            results = await asyncio.gather(*logins)
+            elapsed = time.perf_counter() - start
+    # o lifespan encerra o pool de hash ao sair
+
+    latencies = sorted(lat for _, lat in results)
+    ok = sum(1 for status, _ in results if status == 200)
+    busy = sum(1 for status, _ in results if status == 503)
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+
+    print(f"logins simultâneos: {concurrency}  (200: {ok}, 503: {busy})")
+    print(f"tempo total:        {elapsed:.2f} s")
+    print(f"throughput:         {concurrency / elapsed:.1f} logins/s")
+    print(f"latência p50 / p95: {statistics.median(latencies) * 1000:.0f} / {p95 * 1000:.0f} ms")
+    print(f"/health na rajada:  {health * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=40, help="logins simultâneos (uma turma)")
+    parser.add_argument("--workers", type=int, default=None, help="HASH_WORKERS (0 = sem pool)")
+    parser.add_argument("--rounds", type=int, default=None, help="BCRYPT_ROUNDS")
+    args = parser.parse_args()
+
+    if args.workers is not None:
+        os.environ["HASH_WORKERS"] = str(args.workers)
+    if args.rounds is not None:
+        os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+
+    asyncio.run(main(args.concurrency))
@@ -56,7 +56,10 @@ export function updateAvatarUI() {
   const setAvatar = (imgEl, initEl) => {
     if (!imgEl || !initEl) return;
     if (user.profile_image) {
-      imgEl.src = user.profile_image;
+      // Miniatura (gerada em segundo plano); enquanto não existe, a original
+      const thumb = user.profile_thumbnails && user.profile_thumbnails["128"];
+      imgEl.onerror = thumb ? () => { imgEl.onerror = null; imgEl.src = user.profile_image; } : null;
+      imgEl.src = thumb || user.profile_image;
       imgEl.classList.remove("hidden");
       initEl.classList.add("hidden");
     } else {
@@ -79,40 +79,64 @@ function setLoading(isLoading) {
 // 📂 GESTÃO DE CONVERSAS (SIDEBAR)
 // ========================================================
 
-async function loadConversations() {
+let conversationsCursor = null;
+let loadingConversations = false;
+
+// Lista paginada (resumo sem mensagens): primeira página ou "carregar mais"
+async function loadConversations(append = false) {
     const token = getToken();
     if (!token || !conversationList) return;
+    if (append && (!conversationsCursor || loadingConversations)) return;
 
+    loadingConversations = true;
     try {
-        const res = await fetch(`${API_BASE_URL}/conversations/`, {
+        const params = new URLSearchParams({ limit: 30 });
+        if (append) params.set('cursor', conversationsCursor);
+
+        const res = await fetch(`${API_BASE_URL}/conversations/summary?${params}`, {
             headers: { 'Authorization': `Bearer ${token}` }
         });
         if (!checkAuth(res)) return;
         
-        const convs = await res.json();
-        conversationList.innerHTML = convs.map(c => `
-            <li class="conv-item-container relative group p-3 hover:bg-gray-100 dark:hover:bg-gray-700/50 rounded-lg cursor-pointer mb-1 transition-all border-l-4 ${currentConversationId == c.id ? 'border-blue-600 bg-blue-50 dark:bg-blue-900/10' : 'border-transparent'}" data-id="${c.id}">
-                <div class="flex items-center justify-between w-full btn-load-conv">
-                    <div class="truncate pr-8 pointer-events-none">
-                        <p class="text-sm font-medium text-gray-900 dark:text-gray-100 truncate">${c.title || 'Conversa'}</p>
-                        <p class="text-[10px] text-gray-500">${new Date(c.updated_at || c.created_at).toLocaleDateString()}</p>
-                    </div>
-                </div>
-                
-                <button class="dots-btn absolute right-2 top-1/2 -translate-y-1/2 p-1 hover:bg-gray-200 dark:hover:bg-gray-600 rounded transition-all z-20">
-                    <svg class="w-4 h-4 text-gray-500 pointer-events-none" fill="currentColor" viewBox="0 0 20 20"><path d="M10 6a2 2 0 110-4 2 2 0 010 4zM10 12a2 2 0 110-4 2 2 0 010 4zM10 18a2 2 0 110-4 2 2 0 010 4z"></path></svg>
-                </button>
-
-                <div id="menu-${c.id}" class="conv-options-menu shadow-xl border border-gray-200 dark:border-gray-700 rounded-md py-1 z-50 min-w-[120px] absolute right-2 top-10 bg-white dark:bg-gray-800">
-                    <button class="btn-duplicate w-full text-left px-4 py-2 hover:bg-gray-100 dark:hover:bg-gray-700 text-xs" data-id="${c.id}">Duplicar</button>
-                    <button class="btn-rename w-full text-left px-4 py-2 hover:bg-gray-100 dark:hover:bg-gray-700 text-xs" data-id="${c.id}" data-title="${c.title}">Renomear</button>
-                    <button class="btn-delete w-full text-left px-4 py-2 hover:bg-red-50 dark:hover:bg-red-900/20 text-red-600 text-xs" data-id="${c.id}">Excluir</button>
-                </div>
-            </li>
-        `).join('');
+        const page = await res.json();
+        conversationsCursor = page.next_cursor;
+
+        const html = page.items.map(renderConversationItem).join('');
+        if (append) conversationList.insertAdjacentHTML('beforeend', html);
+        else conversationList.innerHTML = html;
     } catch (e) { console.error("Erro na lista:", e); }
+    finally { loadingConversations = false; }
 }
 
+function renderConversationItem(c) {
+    return `
+        <li class="conv-item-container relative group p-3 hover:bg-gray-100 dark:hover:bg-gray-700/50 rounded-lg cursor-pointer mb-1 transition-all border-l-4 ${currentConversationId == c.id ? 'border-blue-600 bg-blue-50 dark:bg-blue-900/10' : 'border-transparent'}" data-id="${c.id}">
+            <div class="flex items-center justify-between w-full btn-load-conv">
+                <div class="truncate pr-8 pointer-events-none">
+                    <p class="text-sm font-medium text-gray-900 dark:text-gray-100 truncate">${c.title || 'Conversa'}</p>
+                    <p class="text-[10px] text-gray-500">${new Date(c.updated_at || c.created_at).toLocaleDateString()}</p>
+                </div>
+            </div>
+            
+            <button class="dots-btn absolute right-2 top-1/2 -translate-y-1/2 p-1 hover:bg-gray-200 dark:hover:bg-gray-600 rounded transition-all z-20">
+                <svg class="w-4 h-4 text-gray-500 pointer-events-none" fill="currentColor" viewBox="0 0 20 20"><path d="M10 6a2 2 0 110-4 2 2 0 010 4zM10 12a2 2 0 110-4 2 2 0 010 4zM10 18a2 2 0 110-4 2 2 0 010 4z"></path></svg>
+            </button>
+
+            <div id="menu-${c.id}" class="conv-options-menu shadow-xl border border-gray-200 dark:border-gray-700 rounded-md py-1 z-50 min-w-[120px] absolute right-2 top-10 bg-white dark:bg-gray-800">
+                <button class="btn-duplicate w-full text-left px-4 py-2 hover:bg-gray-100 dark:hover:bg-gray-700 text-xs" data-id="${c.id}">Duplicar</button>
+                <button class="btn-rename w-full text-left px-4 py-2 hover:bg-gray-100 dark:hover:bg-gray-700 text-xs" data-id="${c.id}" data-title="${c.title}">Renomear</button>
+                <button class="btn-delete w-full text-left px-4 py-2 hover:bg-red-50 dark:hover:bg-red-900/20 text-red-600 text-xs" data-id="${c.id}">Excluir</button>
+            </div>
+        </li>
+    `;
+}
+
+conversationList?.addEventListener('scroll', () => {
+    if (conversationList.scrollTop + conversationList.clientHeight >= conversationList.scrollHeight - 40) {
+        loadConversations(true);
+    }
+});
+
 // ========================================================
 // 🕹️ DELEGATION DE EVENTOS (ABRE MENU E TRATA AÇÕES)
 // ========================================================
@@ -184,6 +208,15 @@ document.addEventListener('click', async (e) => {
 // 💬 CHAT CORE (ENVIO E CARREGAMENTO)
 // ========================================================
 
+let olderMessagesCursor = null;
+let loadingOlderMessages = false;
+
+function renderMessage(m) {
+    const isUser = m.role === 'user';
+    return `<div class="flex ${isUser ? 'justify-end' : 'justify-start'} mb-4"><div class="max-w-[85%] p-3 rounded-lg shadow-sm ${isUser ? 'bg-blue-600 text-white' : 'bg-gray-100 dark:bg-gray-800 text-gray-800 dark:text-gray-200'}">${m.content}</div></div>`;
+}
+
+// Abre a conversa pela página mais recente de mensagens
 async function loadConversationById(id) {
     const token = getToken();
     try {
@@ -193,19 +226,42 @@ async function loadConversationById(id) {
         
         const data = await res.json();
         currentConversationId = id;
+        olderMessagesCursor = data.prev_cursor;
         chatMessages.innerHTML = renderWelcomeMessage();
-
-        (data.messages || []).forEach(m => {
-            const isUser = m.role === 'user';
-            chatMessages.innerHTML += `<div class="flex ${isUser ? 'justify-end' : 'justify-start'} mb-4"><div class="max-w-[85%] p-3 rounded-lg shadow-sm ${isUser ? 'bg-blue-600 text-white' : 'bg-gray-100 dark:bg-gray-800 text-gray-800 dark:text-gray-200'}">${m.content}</div></div>`;
-        });
+        chatMessages.insertAdjacentHTML('beforeend', (data.messages || []).map(renderMessage).join(''));
         loadConversations();
         chatMessages.scrollTop = chatMessages.scrollHeight;
     } finally { setLoading(false); }
 }
 
+// Ao rolar para o topo, carrega a página anterior (mensagens mais antigas)
+async function loadOlderMessages() {
+    if (!olderMessagesCursor || loadingOlderMessages || !currentConversationId) return;
+    loadingOlderMessages = true;
+    const id = currentConversationId;
+    try {
+        const params = new URLSearchParams({ before: olderMessagesCursor });
+        const res = await fetch(`${API_BASE_URL}/conversations/${id}?${params}`, { headers: { 'Authorization': `Bearer ${getToken()}` } });
+        if (!checkAuth(res) || id !== currentConversationId) return;
+
+        const data = await res.json();
+        olderMessagesCursor = data.prev_cursor;
+
+        const previousHeight = chatMessages.scrollHeight;
+        const html = (data.messages || []).map(renderMessage).join('');
+        if (chatMessages.firstElementChild) chatMessages.firstElementChild.insertAdjacentHTML('afterend', html);
+        else chatMessages.insertAdjacentHTML('afterbegin', html);
+        chatMessages.scrollTop += chatMessages.scrollHeight - previousHeight;
+    } finally { loadingOlderMessages = false; }
+}
+
+chatMessages?.addEventListener('scroll', () => {
+    if (chatMessages.scrollTop < 40) loadOlderMessages();
+});
+
 function startNewChat() {
     currentConversationId = null;
+    olderMessagesCursor = null;
     chatMessages.innerHTML = renderWelcomeMessage();
     loadConversations();
 }
@@ -236,17 +292,44 @@ form?.addEventListener("submit", async (e) => {
         const res = await fetch(`${API_BASE_URL}/chat/`, {
             method: "POST",
             headers: { "Content-Type": "application/json", "Authorization": `Bearer ${token}` },
-            body: JSON.stringify({ text, content: text, conversation_id: currentConversationId, language: (typeof getLanguage === 'function' ? getLanguage() : 'pt-BR') })
+            body: JSON.stringify({ text, content: text, conversation_id: currentConversationId, stream: true, language: (typeof getLanguage === 'function' ? getLanguage() : 'pt-BR') })
         });
         if (!checkAuth(res)) return;
-        const data = await res.json();
-        
-        if (data.conversation_id && !currentConversationId) {
-            currentConversationId = data.conversation_id;
-            loadConversations();
+
+        // Resposta em streaming (NDJSON): mostra os tokens assim que chegam
+        const wrapper = document.createElement('div');
+        wrapper.className = 'flex justify-start mb-4';
+        wrapper.innerHTML = `<div class="max-w-[85%] bg-gray-100 dark:bg-gray-800 p-3 rounded-lg text-gray-800 dark:text-gray-200 shadow-sm"></div>`;
+        chatMessages.appendChild(wrapper);
+        const bubble = wrapper.firstElementChild;
+
+        let reply = "";
+        const handleEvent = (evt) => {
+            if (evt.conversation_id && !currentConversationId) {
+                currentConversationId = evt.conversation_id;
+                loadConversations();
+            }
+            if (evt.type === 'token') {
+                reply += evt.content;
+                bubble.textContent = reply;
+            } else if (evt.type === 'done') {
+                bubble.innerHTML = evt.reply.trim();
+            }
+            chatMessages.scrollTop = chatMessages.scrollHeight;
+        };
+
+        const reader = res.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = "";
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split("\n");
+            buffer = lines.pop();
+            lines.filter(l => l.trim()).forEach(l => handleEvent(JSON.parse(l)));
         }
-        chatMessages.innerHTML += `<div class="flex justify-start mb-4"><div class="max-w-[85%] bg-gray-100 dark:bg-gray-800 p-3 rounded-lg text-gray-800 dark:text-gray-200 shadow-sm">${data.reply.trim()}</div></div>`;
-        chatMessages.scrollTop = chatMessages.scrollHeight;
+        if (buffer.trim()) handleEvent(JSON.parse(buffer));
     } finally { setLoading(false); }
 });
 
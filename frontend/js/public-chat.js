@@ -195,7 +195,7 @@ if (form && input && chatMessages) {
 
             if (res.status === 429) {
                 const data = await res.json();
-                renderRateLimitBox(data.retry_after_seconds);
+                renderRateLimitBox(data.detail?.retry_after ?? Number(res.headers.get("Retry-After")));
                 return;
             }
 